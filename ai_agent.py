@@ -10,6 +10,9 @@ Created on Sat Nov 22 18:00:10 2025
 from typing import List, Tuple, Optional
 import os
 import pickle
+import time
+
+import tetris_rules
 
 WEIGHTS_FILE = "ai_weights.pkl"
 
@@ -29,6 +32,14 @@ class TetrisAI:
         self.w_holes = w_holes
         self.w_bumpiness = w_bumpiness
 
+        # Reused by choose_move so the candidate loop allocates no boards
+        self._scratch: List[int] = []
+        self._heights: List[int] = []
+        self._zero_heights: List[int] = []
+
+        # Optional telemetry.Telemetry; times move search and feature evaluation
+        self.telemetry = None
+
         # Optionally load learned weights
         if load_from_file and os.path.exists(WEIGHTS_FILE):
             try:
@@ -63,32 +74,187 @@ class TetrisAI:
         Returns (best_rotation_count, best_x_position)
         rotation_count: 0-3
         x_position: column index where the shape's leftmost block will be placed.
+
+        Converts `board` to an occupancy view first; callers that already keep
+        one should use choose_move.
+        """
+        return self.choose_move(
+            tetris_rules.board_to_occupancy(board), len(board[0]), current_shape
+        )
+
+    def choose_move(
+        self,
+        occupancy: List[int],
+        width: int,
+        current_shape: List[List[int]],
+    ) -> Tuple[int, int]:
         """
+        choose_best_move on a row-bitmask occupancy view (see tetris_rules).
+
+        Each candidate is placed into a reusable scratch copy, scored with
+        full rows skipped (as if cleared), then undone by restoring the rows
+        it touched, so the inner loop builds no new boards.
+        """
+        telemetry = self.telemetry
+        if telemetry is not None:
+            search_start = time.perf_counter()
+            eval_time = 0.0
+            candidates = 0
+
+        if len(self._zero_heights) != width:
+            self._heights = [0] * width
+            self._zero_heights = [0] * width
+        scratch = self._scratch
+        scratch[:] = occupancy
+        full = (1 << width) - 1
+        # Games never leave full rows behind, but count any so scores match clear_lines
+        already_full = occupancy.count(full)
+        surfaces = tetris_rules.column_surfaces(occupancy, width)
+        # Rows above the stack are empty, so scoring can start at the piece or the stack
+        stack_top = min(surfaces)
+
         best_score = None
         best_rotation = 0
         best_x = 0
 
-        rotated_shape = current_shape
-        for rot in range(4):
-            shape_w = len(rotated_shape[0])
-            for x in range(0, len(board[0]) - shape_w + 1):
-                test_board, lines_cleared = self.simulate_drop(board, rotated_shape, x)
-                if test_board is None:
+        seen = set()
+        for rot, (masks, shape_w, profile) in enumerate(tetris_rules.orientations(current_shape)):
+            # Symmetric pieces repeat orientations; the first one wins ties anyway
+            if masks in seen:
+                continue
+            seen.add(masks)
+            shape_h = len(masks)
+            for x in range(0, width - shape_w + 1):
+                y_pos = self.landing_row(surfaces, profile, x)
+                if y_pos is None:
+                    # Stack above the piece's spawn rows: step it down instead
+                    y_pos = self.drop_row(scratch, masks, x)
+                elif y_pos < 0:
+                    y_pos = None
+                if y_pos is None:
                     continue
 
-                score = self.evaluate_board(test_board, lines_cleared)
+                # Place
+                lines_cleared = already_full
+                for r in range(shape_h):
+                    row = scratch[y_pos + r] | (masks[r] << x)
+                    scratch[y_pos + r] = row
+                    if row == full:
+                        lines_cleared += 1
+
+                if telemetry is None:
+                    score = self.evaluate_scratch(
+                        scratch, width, full, lines_cleared, min(stack_top, y_pos)
+                    )
+                else:
+                    eval_start = time.perf_counter()
+                    score = self.evaluate_scratch(
+                        scratch, width, full, lines_cleared, min(stack_top, y_pos)
+                    )
+                    eval_time += time.perf_counter() - eval_start
+                    candidates += 1
+
+                # Undo
+                for r in range(shape_h):
+                    scratch[y_pos + r] = occupancy[y_pos + r]
+
                 if best_score is None or score > best_score:
                     best_score = score
                     best_rotation = rot
                     best_x = x
 
-            rotated_shape = self.rotate_shape(rotated_shape)
+        if telemetry is not None:
+            telemetry.add_time("move_search", time.perf_counter() - search_start)
+            telemetry.add_time("feature_eval", eval_time)
+            telemetry.count("candidates", candidates)
 
         return best_rotation, best_x
 
+    def landing_row(self, surfaces: List[int], profile, x_pos: int) -> Optional[int]:
+        """
+        Closed-form drop: the piece rests one row above the first column
+        where its bottom cell meets the column surface. Returns a negative
+        row if it cannot enter the board, or None when the profile is
+        unknown or the stack reaches above the piece's top cell in some
+        column (then it could slide under an overhang; use drop_row).
+        """
+        if profile is None:
+            return None
+        y_pos = None
+        for c, (top, bottom) in enumerate(profile):
+            surface = surfaces[x_pos + c]
+            if surface < top:
+                return None
+            if y_pos is None or surface - 1 - bottom < y_pos:
+                y_pos = surface - 1 - bottom
+        return y_pos
+
+    def drop_row(self, occupancy: List[int], masks: Tuple[int, ...], x_pos: int) -> Optional[int]:
+        """Top row where the piece comes to rest when dropped from row 0, or None."""
+        height = len(occupancy)
+        shape_h = len(masks)
+
+        y_pos = 0
+        while True:
+            if tetris_rules.collides_masks(occupancy, masks, x_pos, y_pos):
+                y_pos -= 1
+                break
+            y_pos += 1
+            if y_pos + shape_h > height:
+                y_pos -= 1
+                break
+
+        if y_pos < 0 or tetris_rules.collides_masks(occupancy, masks, x_pos, y_pos):
+            return None
+        return y_pos
+
+    def evaluate_scratch(
+        self,
+        scratch: List[int],
+        width: int,
+        full: int,
+        lines_cleared: int,
+        start_row: int = 0,
+    ) -> float:
+        """
+        evaluate_occupancy with full rows treated as already cleared.
+        Rows above `start_row` must be empty.
+        """
+        heights = self._heights
+        heights[:] = self._zero_heights
+        level = len(scratch) - start_row - lines_cleared
+        seen = 0
+        holes = 0
+        for i in range(start_row, len(scratch)):
+            m = scratch[i]
+            if m == full:
+                continue
+            new = m & ~seen
+            while new:
+                low = new & -new
+                heights[low.bit_length() - 1] = level
+                new ^= low
+            holes += (seen & ~m).bit_count()
+            seen |= m
+            level -= 1
+
+        agg_height = 0
+        bumpiness = 0
+        prev = heights[0]
+        for h in heights:
+            agg_height += h
+            bumpiness += h - prev if h > prev else prev - h
+            prev = h
+
+        return (
+            self.w_lines * lines_cleared
+            + self.w_height * agg_height
+            + self.w_holes * holes
+            + self.w_bumpiness * bumpiness
+        )
+
     def rotate_shape(self, shape: List[List[int]]) -> List[List[int]]:
-        # Rotate 90 degrees clockwise
-        return [list(row) for row in zip(*shape[::-1])]
+        return tetris_rules.rotate_shape(shape)
 
     def simulate_drop(
         self,
@@ -98,7 +264,6 @@ class TetrisAI:
     ) -> Tuple[Optional[List[List[int]]], int]:
         height = len(board)
         shape_h = len(shape)
-        shape_w = len(shape[0])
 
         y_pos = 0
         while True:
@@ -114,12 +279,8 @@ class TetrisAI:
             return None, 0
 
         new_board = [row[:] for row in board]
-        for y in range(shape_h):
-            for x in range(shape_w):
-                if shape[y][x]:
-                    new_board[y_pos + y][x_pos + x] = 1
-
-        new_board, lines_cleared = self.clear_lines(new_board)
+        tetris_rules.place_piece(new_board, shape, x_pos, y_pos)
+        lines_cleared = tetris_rules.clear_lines(new_board)
         return new_board, lines_cleared
 
     def check_collision(
@@ -129,43 +290,23 @@ class TetrisAI:
         x_pos: int,
         y_pos: int,
     ) -> bool:
-        height = len(board)
-        width = len(board[0])
-        shape_h = len(shape)
-        shape_w = len(shape[0])
-
-        for y in range(shape_h):
-            for x in range(shape_w):
-                if shape[y][x]:
-                    bx = x_pos + x
-                    by = y_pos + y
-                    if bx < 0 or bx >= width or by < 0 or by >= height:
-                        return True
-                    if board[by][bx]:
-                        return True
-        return False
+        return tetris_rules.check_collision(board, shape, x_pos, y_pos)
 
     def clear_lines(self, board: List[List[int]]):
-        height = len(board)
-        width = len(board[0])
-        new_board = []
-        lines_cleared = 0
-
-        for y in range(height):
-            if all(board[y][x] != 0 for x in range(width)):
-                lines_cleared += 1
-            else:
-                new_board.append(board[y])
-
-        while len(new_board) < height:
-            new_board.insert(0, [0] * width)
-
-        return new_board, lines_cleared
+        # Clears in place; returns the same board for callers expecting a pair
+        lines_cleared = tetris_rules.clear_lines(board)
+        return board, lines_cleared
 
     def evaluate_board(self, board: List[List[int]], lines_cleared: int) -> float:
-        agg_height = self.aggregate_height(board)
-        holes = self.count_holes(board)
-        bumpiness = self.bumpiness(board)
+        return self.evaluate_occupancy(
+            tetris_rules.board_to_occupancy(board), len(board[0]), lines_cleared
+        )
+
+    def evaluate_occupancy(self, occupancy: List[int], width: int, lines_cleared: int) -> float:
+        heights = tetris_rules.column_heights(occupancy, width)
+        agg_height = sum(heights)
+        holes = tetris_rules.count_holes(occupancy)
+        bumpiness = tetris_rules.bumpiness(heights)
 
         score = (
             self.w_lines * lines_cleared
@@ -176,32 +317,13 @@ class TetrisAI:
         return score
 
     def column_heights(self, board: List[List[int]]) -> List[int]:
-        height = len(board)
-        width = len(board[0])
-        heights = [0] * width
-        for x in range(width):
-            for y in range(height):
-                if board[y][x]:
-                    heights[x] = height - y
-                    break
-        return heights
+        return tetris_rules.column_heights(tetris_rules.board_to_occupancy(board), len(board[0]))
 
     def aggregate_height(self, board: List[List[int]]) -> int:
         return sum(self.column_heights(board))
 
     def count_holes(self, board: List[List[int]]) -> int:
-        height = len(board)
-        width = len(board[0])
-        holes = 0
-        for x in range(width):
-            block_seen = False
-            for y in range(height):
-                if board[y][x]:
-                    block_seen = True
-                elif block_seen and not board[y][x]:
-                    holes += 1
-        return holes
+        return tetris_rules.count_holes(tetris_rules.board_to_occupancy(board))
 
     def bumpiness(self, board: List[List[int]]) -> int:
-        heights = self.column_heights(board)
-        return sum(abs(heights[i] - heights[i + 1]) for i in range(len(heights) - 1))
+        return tetris_rules.bumpiness(self.column_heights(board))
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:02:15 2026
+
+@author: dana-paulette
+
+Benchmarks for the AI decision path: time and tracemalloc peak memory per
+piece, on board positions taken from seeded HeadlessTetrisEnv games.
+
+The "legacy" row is LegacyTetrisAI, a copy of the original copy-per-candidate
+search kept here as the reference; both searches are checked to choose the
+same move on every position before anything is timed.
+
+Run: python bench_ai.py [--positions N] [--sizes] [--plot out.png]
+"""
+
+# bench_ai.py
+import argparse
+import random
+import time
+import tracemalloc
+
+from ai_agent import TetrisAI
+from tetris_rules import GRID_WIDTH, GRID_HEIGHT, SHAPES
+from train_ai import HeadlessTetrisEnv
+
+
+def collect_positions(num_positions, seed=0, width=GRID_WIDTH, height=GRID_HEIGHT):
+    """(board copy, occupancy copy, shape) for the decision before each placement."""
+    ai = TetrisAI(load_from_file=False)
+    env = HeadlessTetrisEnv(ai, max_steps=num_positions, seed=seed, width=width, height=height)
+    positions = []
+    while len(positions) < num_positions:
+        if env.game_over:
+            env.reset(random.Random(seed + len(positions)).getrandbits(32))
+        positions.append(
+            ([row[:] for row in env.board], list(env.occupancy), [row[:] for row in env.current_shape])
+        )
+        env.step()
+    return positions
+
+
+class LegacyTetrisAI:
+    """
+    The original TetrisAI search, unchanged: every candidate drop copies the
+    board, clears lines into another new board and scores it cell by cell.
+    """
+
+    def __init__(self, w_lines=1.0, w_height=-0.5, w_holes=-0.8, w_bumpiness=-0.3, load_from_file=False):
+        self.w_lines = w_lines
+        self.w_height = w_height
+        self.w_holes = w_holes
+        self.w_bumpiness = w_bumpiness
+
+    def choose_best_move(self, board, shapes, current_shape):
+        best_score = None
+        best_rotation = 0
+        best_x = 0
+
+        rotated_shape = current_shape
+        for rot in range(4):
+            shape_w = len(rotated_shape[0])
+            for x in range(0, len(board[0]) - shape_w + 1):
+                test_board, lines_cleared = self.simulate_drop(board, rotated_shape, x)
+                if test_board is None:
+                    continue
+
+                score = self.evaluate_board(test_board, lines_cleared)
+                if best_score is None or score > best_score:
+                    best_score = score
+                    best_rotation = rot
+                    best_x = x
+
+            rotated_shape = self.rotate_shape(rotated_shape)
+
+        return best_rotation, best_x
+
+    def rotate_shape(self, shape):
+        return [list(row) for row in zip(*shape[::-1])]
+
+    def simulate_drop(self, board, shape, x_pos):
+        height = len(board)
+        shape_h = len(shape)
+        shape_w = len(shape[0])
+
+        y_pos = 0
+        while True:
+            if self.check_collision(board, shape, x_pos, y_pos):
+                y_pos -= 1
+                break
+            y_pos += 1
+            if y_pos + shape_h > height:
+                y_pos -= 1
+                break
+
+        if y_pos < 0 or self.check_collision(board, shape, x_pos, y_pos):
+            return None, 0
+
+        new_board = [row[:] for row in board]
+        for y in range(shape_h):
+            for x in range(shape_w):
+                if shape[y][x]:
+                    new_board[y_pos + y][x_pos + x] = 1
+
+        new_board, lines_cleared = self.clear_lines(new_board)
+        return new_board, lines_cleared
+
+    def check_collision(self, board, shape, x_pos, y_pos):
+        height = len(board)
+        width = len(board[0])
+        shape_h = len(shape)
+        shape_w = len(shape[0])
+
+        for y in range(shape_h):
+            for x in range(shape_w):
+                if shape[y][x]:
+                    bx = x_pos + x
+                    by = y_pos + y
+                    if bx < 0 or bx >= width or by < 0 or by >= height:
+                        return True
+                    if board[by][bx]:
+                        return True
+        return False
+
+    def clear_lines(self, board):
+        height = len(board)
+        width = len(board[0])
+        new_board = []
+        lines_cleared = 0
+
+        for y in range(height):
+            if all(board[y][x] != 0 for x in range(width)):
+                lines_cleared += 1
+            else:
+                new_board.append(board[y])
+
+        while len(new_board) < height:
+            new_board.insert(0, [0] * width)
+
+        return new_board, lines_cleared
+
+    def evaluate_board(self, board, lines_cleared):
+        agg_height = self.aggregate_height(board)
+        holes = self.count_holes(board)
+        bumpiness = self.bumpiness(board)
+
+        score = (
+            self.w_lines * lines_cleared
+            + self.w_height * agg_height
+            + self.w_holes * holes
+            + self.w_bumpiness * bumpiness
+        )
+        return score
+
+    def column_heights(self, board):
+        height = len(board)
+        width = len(board[0])
+        heights = [0] * width
+        for x in range(width):
+            for y in range(height):
+                if board[y][x]:
+                    heights[x] = height - y
+                    break
+        return heights
+
+    def aggregate_height(self, board):
+        return sum(self.column_heights(board))
+
+    def count_holes(self, board):
+        height = len(board)
+        width = len(board[0])
+        holes = 0
+        for x in range(width):
+            block_seen = False
+            for y in range(height):
+                if board[y][x]:
+                    block_seen = True
+                elif block_seen and not board[y][x]:
+                    holes += 1
+        return holes
+
+    def bumpiness(self, board):
+        heights = self.column_heights(board)
+        return sum(abs(heights[i] - heights[i + 1]) for i in range(len(heights) - 1))
+
+
+def legacy_decision(ai, board, occupancy, shape):
+    # Pre-occupancy path: binary copies of board and shape before every decision
+    binary_board = [[1 if cell != 0 else 0 for cell in row] for row in board]
+    binary_shape = [[1 if cell != 0 else 0 for cell in row] for row in shape]
+    return ai.choose_best_move(binary_board, SHAPES, binary_shape)
+
+
+def occupancy_decision(ai, board, occupancy, shape):
+    return ai.choose_move(occupancy, len(board[0]), shape)
+
+
+# Each decision function with the AI class it runs on
+DECISIONS = {
+    "legacy binary copy": (legacy_decision, LegacyTetrisAI),
+    "occupancy": (occupancy_decision, TetrisAI),
+}
+
+
+def check_same_moves(positions):
+    """Assert the legacy and occupancy searches choose the same move everywhere."""
+    legacy, current = LegacyTetrisAI(), TetrisAI(load_from_file=False)
+    for i, (board, occupancy, shape) in enumerate(positions):
+        expected = legacy_decision(legacy, board, occupancy, shape)
+        actual = occupancy_decision(current, board, occupancy, shape)
+        assert actual == expected, f"position {i}: occupancy search chose {actual}, legacy {expected}"
+
+
+def profile_time(decide, positions, ai_class=TetrisAI):
+    """Mean wall time per decision."""
+    ai = ai_class(load_from_file=False)
+    start = time.perf_counter()
+    for board, occupancy, shape in positions:
+        decide(ai, board, occupancy, shape)
+    return (time.perf_counter() - start) / len(positions)
+
+
+def profile(decide, positions, ai_class=TetrisAI):
+    """Mean wall time and mean tracemalloc peak (bytes) per decision."""
+    per_decision = profile_time(decide, positions, ai_class)
+
+    ai = ai_class(load_from_file=False)
+    peaks = 0
+    tracemalloc.start()
+    for board, occupancy, shape in positions:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        decide(ai, board, occupancy, shape)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return per_decision, peaks / len(positions)
+
+
+def bench_tall_empty(height, repeats=50):
+    """Mean choose_move time on an empty board `height` rows tall."""
+    ai = TetrisAI(load_from_file=False)
+    occupancy = [0] * height
+    start = time.perf_counter()
+    for i in range(repeats):
+        ai.choose_move(occupancy, GRID_WIDTH, SHAPES[i % len(SHAPES)])
+    return (time.perf_counter() - start) / repeats
+
+
+def bench_board_sizes(widths, heights, num_positions=100):
+    """{(width, height): mean seconds per decision} on seeded game positions."""
+    results = {}
+    for height in heights:
+        for width in widths:
+            positions = collect_positions(num_positions, width=width, height=height)
+            results[(width, height)] = profile_time(occupancy_decision, positions)
+    return results
+
+
+def plot_board_sizes(results, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    for height in sorted({h for _, h in results}):
+        widths = sorted(w for w, h in results if h == height)
+        ax.plot(widths, [results[(w, height)] * 1e3 for w in widths], marker="o", label=f"height {height}")
+    ax.set_title("AI decision time vs board size")
+    ax.set_xlabel("Board width (columns)")
+    ax.set_ylabel("ms per decision")
+    ax.legend()
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AI decision path.")
+    parser.add_argument("--positions", type=int, default=300)
+    parser.add_argument("--sizes", action="store_true", help="sweep board width and height")
+    parser.add_argument("--widths", type=int, nargs="+", default=[10, 20, 40, 80, 128])
+    parser.add_argument("--heights", type=int, nargs="+", default=[22, 44, 88])
+    parser.add_argument("--plot", default=None, help="save the size sweep chart to this PNG")
+    args = parser.parse_args()
+
+    positions = collect_positions(args.positions)
+
+    check_same_moves(positions)
+    print(f"[BENCH] {args.positions} positions, {GRID_WIDTH}-wide board (same move chosen on all)")
+    for name, (decide, ai_class) in DECISIONS.items():
+        per_decision, peak = profile(decide, positions, ai_class)
+        print(f"[BENCH] {name:<20} {per_decision * 1e3:8.3f} ms/piece  {peak / 1024:8.1f} KiB peak/piece")
+
+    for height in (22, 100, 400):
+        per_decision = bench_tall_empty(height)
+        print(f"[BENCH] empty {GRID_WIDTH}x{height:<4} board  {per_decision * 1e3:8.3f} ms/piece")
+
+    if args.sizes or args.plot:
+        results = bench_board_sizes(args.widths, args.heights, num_positions=min(args.positions, 100))
+        print("[BENCH] ms per decision (rows: height, columns: width)")
+        print("        " + "".join(f"{w:>9}" for w in args.widths))
+        for height in args.heights:
+            print(f"  {height:>5} " + "".join(f"{results[(w, height)] * 1e3:9.3f}" for w in args.widths))
+        if args.plot:
+            plot_board_sizes(results, args.plot)
+            print(f"[BENCH] Saved chart to {args.plot}")
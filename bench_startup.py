@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:12:40 2026
+
+@author: dana-paulette
+
+Startup-time benchmark for the game and the dashboard.
+
+Imports each entry module in a fresh interpreter under `python -X importtime`
+and reports total import time plus the heaviest packages pulled in, then
+times TetrisGame construction (first game vs play-again) on a headless
+display.
+
+Run: python bench_startup.py [--top N] [--runs N]
+"""
+
+# bench_startup.py
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+MODULES = ("tetris_game", "dashboard")
+HEAVY = ("pygame", "numpy", "pandas", "matplotlib", "streamlit", "sklearn")
+
+
+def import_profile(module):
+    """
+    {package: cumulative microseconds} for every import made by
+    `import module` in a fresh interpreter, plus the wall time in seconds.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cum)
+    return cumulative, wall
+
+
+def game_construction(runs, **kwargs):
+    """Seconds to build the first TetrisGame and the mean of the next `runs`."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    from tetris_game import TetrisGame
+
+    start = time.perf_counter()
+    TetrisGame("bench", seed=0, **kwargs)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(runs):
+        TetrisGame("bench", seed=i + 1, **kwargs)
+    return first, (time.perf_counter() - start) / runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark game and dashboard startup.")
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list")
+    parser.add_argument("--runs", type=int, default=5, help="play-again games to time")
+    args = parser.parse_args()
+
+    for module in MODULES:
+        try:
+            cumulative, wall = import_profile(module)
+        except RuntimeError as e:
+            print(f"[BENCH] import {module} failed: {e}")
+            continue
+        print(f"[BENCH] import {module}: {cumulative[module] / 1e3:8.1f} ms imports, {wall * 1e3:8.1f} ms process")
+        loaded = [pkg for pkg in HEAVY if pkg in cumulative]
+        print(f"[BENCH]   heavy packages loaded: {', '.join(loaded) or 'none'}")
+        top = sorted(
+            ((us, name) for name, us in cumulative.items() if name != module and "." not in name),
+            reverse=True,
+        )[:args.top]
+        for us, name in top:
+            print(f"[BENCH]   {name:<24} {us / 1e3:8.1f} ms")
+
+    for label, kwargs in (("human", {"ai_mode": False}), ("ai", {"ai_mode": True})):
+        first, again = game_construction(args.runs, **kwargs)
+        print(f"[BENCH] TetrisGame ({label}): first {first * 1e3:8.1f} ms, play-again {again * 1e3:8.1f} ms")
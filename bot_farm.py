@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:58:21 2026
+
+@author: dana-paulette
+
+Bot farm: plays many headless AI games and saves them to the leaderboard,
+instead of starting tetris_game.py by hand for every game.
+
+Games run on a process pool (one worker per core by default, since each
+game is pure CPU) and an asyncio loop in the main process schedules them:
+at most `concurrency` games are queued or running at a time, every game
+gets its own seed (and, with --jitter, its own weights), progress is
+printed every few seconds, and finished games go to a ScoreWriter, which
+writes them to the DB in batches on its own thread.
+
+Ctrl-C (or SIGTERM) stops scheduling, lets the games in flight finish and
+saves them; a second Ctrl-C abandons the games in flight.
+
+Run: python bot_farm.py --games 5000 [--workers 8] [--db tetris_leaderboard.db]
+"""
+
+# bot_farm.py
+import argparse
+import asyncio
+import os
+import pickle
+import random
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ai_agent import TetrisAI, WEIGHTS_FILE
+from db import DB_PATH
+from score_writer import SPILL_FILE, ScoreWriter
+from tetris_rules import level_for_lines
+from train_ai import HeadlessTetrisEnv, random_weights
+
+FARM_USERNAME = "AI_FARM"
+
+
+def load_weights(path: Optional[str] = WEIGHTS_FILE) -> Tuple[float, ...]:
+    """Weights from a pickle like ai_weights.pkl, or TetrisAI's defaults if there is none."""
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return tuple(float(w) for w in pickle.load(f))
+    return TetrisAI(load_from_file=False).get_weights()
+
+
+def farm_jobs(
+    num_games: int,
+    weights: Tuple[float, ...],
+    seed: int = 0,
+    jitter: float = 0.0,
+    max_pieces: int = 10_000,
+) -> Iterator[Tuple[int, Tuple[float, ...], int]]:
+    """(game seed, weights, max_pieces) per game; the same seed gives the same games."""
+    rng = random.Random(seed)
+    for _ in range(num_games):
+        game_weights = random_weights(weights, jitter, rng) if jitter else weights
+        yield rng.getrandbits(63), game_weights, max_pieces
+
+
+def play_game(job: Tuple[int, Tuple[float, ...], int]) -> Dict[str, Any]:
+    """Play one game in a worker; returns score, lines_cleared, level, replay and steps."""
+    seed, weights, max_pieces = job
+    ai = TetrisAI(*weights, load_from_file=False)
+    env = HeadlessTetrisEnv(ai, max_steps=max_pieces, record_replay=True)
+    result = env.run_episode_result(seed)
+    return {
+        "score": result["score"],
+        "lines_cleared": result["lines"],
+        "level": level_for_lines(result["lines"]),
+        "replay": env.replay.to_bytes(),
+        "steps": result["steps"],
+    }
+
+
+def _kill_workers(pool: ProcessPoolExecutor):
+    # Python 3.14 has pool.kill_workers(); before that the worker processes
+    # are only reachable through the pool's private map
+    kill = getattr(pool, "kill_workers", None)
+    if kill is not None:
+        kill()
+        return
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+
+
+def _ignore_sigint():
+    # Ctrl-C reaches every process in the group; the main loop decides
+    # whether the workers' games still count
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+async def run_farm(
+    num_games: int,
+    writer: ScoreWriter,
+    workers: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    seed: int = 0,
+    weights: Optional[Tuple[float, ...]] = None,
+    jitter: float = 0.0,
+    max_pieces: int = 10_000,
+    username: str = FARM_USERNAME,
+    progress_every: float = 5.0,
+) -> Dict[str, Any]:
+    """Play num_games games, submitting each to writer as it finishes; returns farm stats."""
+    workers = workers or os.cpu_count() or 1
+    # Two per worker keeps every worker busy while results travel back
+    concurrency = concurrency or 2 * workers
+    weights = weights or load_weights()
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    in_flight = set()
+    stats = {"games": 0, "failed": 0, "pieces": 0, "best": 0, "score_sum": 0, "stopped": False, "abandoned": False}
+    start = time.perf_counter()
+
+    def request_stop():
+        if not stats["stopped"]:
+            stats["stopped"] = True
+            print(f"[FARM] Stopping: finishing {len(in_flight)} games in flight (Ctrl-C again to abandon them)")
+        else:
+            print(f"[FARM] Abandoning {len(in_flight)} games in flight")
+            stats["abandoned"] = True
+            # Kill the running games too: shutting down only stops queued ones
+            _kill_workers(pool)
+            pool.shutdown(wait=False, cancel_futures=True)
+            for task in in_flight:
+                task.cancel()
+
+    async def play(job):
+        try:
+            record = await loop.run_in_executor(pool, play_game, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # one bad game must not stop the farm
+            stats["failed"] += 1
+            print(f"[FARM] Game with seed {job[0]} failed: {e!r}")
+        else:
+            writer.submit(username, record["score"], True, record["lines_cleared"], record["level"], record["replay"])
+            stats["games"] += 1
+            stats["pieces"] += record["steps"]
+            stats["score_sum"] += record["score"]
+            stats["best"] = max(stats["best"], record["score"])
+        finally:
+            slots.release()
+
+    async def report():
+        while True:
+            await asyncio.sleep(progress_every)
+            elapsed = time.perf_counter() - start
+            print(f"[FARM] {stats['games']}/{num_games} games ({stats['games'] / elapsed:.1f} games/s, "
+                  f"{stats['pieces'] / elapsed:,.0f} pieces/s), best {stats['best']}, "
+                  f"{len(in_flight)} in flight, {writer.pending()} waiting to be written")
+
+    # Not a with block: its exit waits for running games, even after a
+    # second Ctrl-C has abandoned them
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint)
+    handled = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, request_stop)
+            handled.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl-C raises KeyboardInterrupt instead
+    reporter = asyncio.create_task(report())
+    try:
+        for job in farm_jobs(num_games, weights, seed, jitter, max_pieces):
+            await slots.acquire()
+            if stats["stopped"]:
+                break
+            task = asyncio.create_task(play(job))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    finally:
+        reporter.cancel()
+        for sig in handled:
+            loop.remove_signal_handler(sig)
+        # Already shut down, without waiting, if the games were abandoned
+        if not stats["abandoned"]:
+            pool.shutdown(wait=True)
+
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def farm(num_games: int, db_path: str = DB_PATH, batch_size: int = 256, **options) -> Dict[str, Any]:
+    """Run the farm against db_path and wait until every finished game is written."""
+    # The farm's own spill file unless it shares the game's DB
+    spill_path = SPILL_FILE if os.path.abspath(db_path) == os.path.abspath(DB_PATH) else db_path + ".pending.jsonl"
+    writer = ScoreWriter(db_path=db_path, spill_path=spill_path, batch_size=batch_size)
+    try:
+        stats = asyncio.run(run_farm(num_games, writer, **options))
+    finally:
+        writer.close(timeout=60.0)
+    stats["written"] = writer.written
+    stats["spilled"] = writer.spilled
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play headless AI games into the leaderboard.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="games queued or running at once (default: 2 per worker)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the game seeds and weight jitter")
+    parser.add_argument("--weights", default=WEIGHTS_FILE, help="pickled weights (default: learned weights)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="perturb each game's weights by up to this much")
+    parser.add_argument("--max-pieces", type=int, default=10_000, help="end a game after this many pieces")
+    parser.add_argument("--username", default=FARM_USERNAME)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--batch-size", type=int, default=256, help="most games per DB transaction")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    result = farm(
+        args.games,
+        args.db,
+        args.batch_size,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        seed=args.seed,
+        weights=load_weights(args.weights),
+        jitter=args.jitter,
+        max_pieces=args.max_pieces,
+        username=args.username,
+        progress_every=args.progress,
+    )
+    games = result["games"]
+    mean = result["score_sum"] / games if games else 0
+    print(f"[FARM] {games} games in {result['elapsed']:.1f}s ({games / result['elapsed']:.1f} games/s), "
+          f"mean score {mean:.0f}, best {result['best']}, {result['failed']} failed, "
+          f"{result['written']} written, {result['spilled']} spilled")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:20:33 2026
+
+@author: dana-paulette
+
+Memory-growth check for dashboard.py: drives the app through repeated
+reruns with Streamlit's AppTest, cycling the player filter, and fails if
+matplotlib figures stay open or traced memory keeps growing once every
+chart has been rendered (and cached) once.
+
+Traced memory is sampled after every pass. It does not grow smoothly: it
+climbs by a MiB or so and drops back about every 200 reruns (Streamlit and
+GC housekeeping). So the check compares the peak of the second half of the
+passes with the peak of the first half. Memory that levels off has the
+same peak in both; a leak raises the second one by its rate times the
+reruns in between.
+
+Run from the directory holding tetris_leaderboard.db:
+    python check_dashboard_memory.py [passes]
+"""
+
+# check_dashboard_memory.py
+import os
+import sys
+import tracemalloc
+
+from streamlit.testing.v1 import AppTest
+
+DASHBOARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+# How much higher the second half's peak may be, per rerun in that half.
+# The current build measures between -2 and +1 KiB per rerun (300 reruns);
+# the rest is margin for tracemalloc noise. One leaked chart figure adds
+# about 700 KiB per rerun, so even a leak 100 times smaller fails.
+STEADY_GROWTH_PER_RERUN = 4 * 1024
+# AppTest also recompiles the script on every run and keeps the code
+# objects; that is the test harness, not the dashboard, so leave it out
+HARNESS_FILTERS = [
+    tracemalloc.Filter(False, "*/ast.py"),
+    tracemalloc.Filter(False, "*/streamlit/runtime/scriptrunner/script_cache.py"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+]
+
+
+def rerun_through_filters(app, passes):
+    """Select every player in turn, switching on any hidden chart; returns the rerun count."""
+    runs = 0
+    for _ in range(passes):
+        select = app.sidebar.selectbox[0]
+        for option in select.options:
+            select = app.sidebar.selectbox[0]
+            select.set_value(option).run()
+            runs += 1
+            assert not app.exception, app.exception[0].message
+            for toggle in app.toggle:
+                if not toggle.value:
+                    toggle.set_value(True).run()
+                    runs += 1
+    return runs
+
+
+def traced(filters):
+    return tracemalloc.take_snapshot().filter_traces(filters)
+
+
+def growth(before, after):
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+if __name__ == "__main__":
+    passes = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    half = max(1, passes // 2)
+
+    app = AppTest.from_file(DASHBOARD, default_timeout=120).run()
+    assert not app.exception, app.exception[0].message
+
+    # Warm-up: every chart for every filter is rendered once and cached
+    rerun_through_filters(app, 1)
+
+    import matplotlib.pyplot as plt
+
+    tracemalloc.start()
+    baseline = traced(HARNESS_FILTERS)
+    # Growth since the baseline after each pass
+    samples = []
+    runs = 0
+    for _ in range(2 * half):
+        runs += rerun_through_filters(app, 1)
+        samples.append(growth(baseline, traced(HARNESS_FILTERS)))
+    tracemalloc.stop()
+
+    open_figures = len(plt.get_fignums())
+    first_peak, second_peak = max(samples[:half]), max(samples[half:])
+    per_rerun = (second_peak - first_peak) / (runs / 2)
+    print(f"[MEMORY] {runs} reruns: peak growth {first_peak / 1024:.1f} KiB in the first half, "
+          f"{second_peak / 1024:.1f} KiB in the second ({per_rerun / 1024:+.1f} KiB/rerun), "
+          f"{open_figures} open figures")
+    assert open_figures == 0, f"{open_figures} matplotlib figures left open"
+    assert per_rerun < STEADY_GROWTH_PER_RERUN, (
+        f"memory keeps growing: {per_rerun / 1024:.1f} KiB per rerun "
+        f"(budget {STEADY_GROWTH_PER_RERUN / 1024:.0f} KiB)"
+    )
+    print("[MEMORY] OK")
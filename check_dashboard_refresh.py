@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:41:16 2026
+
+@author: dana-paulette
+
+Check for dashboard.LiveLeaderboard: a game committed while the dashboard
+is loading, or while a writer keeps inserting, must be taken in by the
+next refresh() without another full reload.
+
+Run: python check_dashboard_refresh.py [games]
+"""
+
+# check_dashboard_refresh.py
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+import dashboard
+from db import LeaderboardDB
+
+
+def game(i):
+    return {"username": f"player{i % 7}", "score": (i % 40) * 100, "is_ai": i % 2 == 0,
+            "lines_cleared": i % 40, "level": 1 + i % 5}
+
+
+class CountingLeaderboard(dashboard.LiveLeaderboard):
+    """LiveLeaderboard that counts its full reloads."""
+
+    reloads = 0
+
+    def _reload(self):
+        self.reloads += 1
+        super()._reload()
+
+
+def check_insert_during_load(db):
+    load_data = dashboard.load_data
+
+    def load_then_insert(db_path=None):
+        # Lands after the rows are read, where the game count used to be
+        df = load_data(db_path)
+        db.insert_score("late", 500, False, 5, 1)
+        return df
+
+    dashboard.load_data = load_then_insert
+    try:
+        live = CountingLeaderboard(db.db_path)
+    finally:
+        dashboard.load_data = load_data
+    assert live.refresh() == 1, "the game committed during the load was not taken in"
+    assert live.reloads == 1, f"{live.reloads - 1} extra full reloads"
+    return live
+
+
+def check_concurrent_writer(db, live, games):
+    done = threading.Event()
+
+    def write():
+        for i in range(games):
+            db.insert_score(*game(i).values())
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    refreshes = 0
+    while not done.is_set():
+        live.refresh()
+        refreshes += 1
+    writer.join()
+    live.refresh()
+    conn = sqlite3.connect(db.db_path)
+    stored = conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+    conn.close()
+    assert len(live.df) == live.game_count == stored, (
+        f"df has {len(live.df)} rows, count {live.game_count}, DB {stored}"
+    )
+    assert live.reloads == 1, f"{live.reloads - 1} full reloads during {refreshes} refreshes"
+    return refreshes
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = LeaderboardDB(os.path.join(tmp, "refresh.db"))
+        db.insert_scores([game(i) for i in range(50)])
+        live = check_insert_during_load(db)
+        print("[REFRESH] Game committed during the load: taken in incrementally")
+        refreshes = check_concurrent_writer(db, live, games)
+        print(f"[REFRESH] {games} games from a concurrent writer over {refreshes} refreshes: no full reloads")
+        live._conn.close()
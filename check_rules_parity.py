@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:58:02 2026
+
+@author: dana-paulette
+
+Differential check for tetris_rules: plays the same seeded piece sequences
+through TetrisAI's simulation, HeadlessTetrisEnv, TetrisGame (AI mode, no
+window) and the replay verifier's ReplayBoard, and asserts every placement,
+board and score is identical.
+
+Run: python check_rules_parity.py [num_seeds] [max_pieces]
+"""
+
+# check_rules_parity.py
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from ai_agent import TetrisAI
+from db import LeaderboardDB
+from replay import ReplayBoard, verify_replay
+from tetris_game import TetrisGame
+from tetris_rules import SHAPES, board_to_occupancy
+from train_ai import HeadlessTetrisEnv
+
+
+def occupancy(board):
+    return [[1 if cell else 0 for cell in row] for row in board]
+
+
+def play_game_piece(game):
+    """Drive TetrisGame.ai_step until the current piece locks."""
+    placed = len(game.replay)
+    while not game.game_over and len(game.replay) == placed:
+        game.ai_step()
+
+
+def check_seed(seed, max_pieces, db):
+    ai = TetrisAI(load_from_file=False)
+    env = HeadlessTetrisEnv(ai, max_steps=max_pieces, seed=seed, record_replay=True)
+    env.reset(seed)
+    game = TetrisGame(f"parity_{seed}", ai_mode=True, seed=seed, db=db, ai_agent=ai)
+    replayed = ReplayBoard(seed, env.width, env.height)
+
+    for piece in range(max_pieces):
+        if env.game_over or game.game_over:
+            break
+        assert env.current_piece == game.current_piece, f"seed {seed} piece {piece}: piece ids differ"
+
+        rotation, target_x = ai.choose_best_move(occupancy(env.board), SHAPES, env.current_shape)
+        shape = env.current_shape
+        for _ in range(rotation):
+            shape = ai.rotate_shape(shape)
+        predicted, _ = ai.simulate_drop(occupancy(env.board), shape, target_x)
+
+        env.step()
+        play_game_piece(game)
+
+        assert env.board == game.board.tolist(), f"seed {seed} piece {piece}: boards differ"
+        assert env.occupancy == game.occupancy == board_to_occupancy(env.board), (
+            f"seed {seed} piece {piece}: occupancy view out of sync"
+        )
+        assert env.score == game.score, f"seed {seed} piece {piece}: scores differ"
+        assert env.replay.placements == game.replay.placements, f"seed {seed} piece {piece}: placements differ"
+        x, y, applied = env.replay.last()
+        error = replayed.place(x, y, applied)
+        assert error is None, f"seed {seed} piece {piece}: replay rejects the placement ({error})"
+        assert replayed.board == env.board and replayed.occupancy == env.occupancy, (
+            f"seed {seed} piece {piece}: replayed board differs"
+        )
+        assert replayed.score == env.score, f"seed {seed} piece {piece}: replayed score differs"
+        if predicted is not None and x == target_x and applied == rotation % 4:
+            # Path was unobstructed, so the AI's own simulation must agree
+            assert occupancy(env.board) == predicted, f"seed {seed} piece {piece}: AI simulation differs"
+
+    assert env.game_over == game.game_over, f"seed {seed}: game-over state differs"
+    lines = game.lines_cleared_total
+    assert (replayed.lines, replayed.level) == (lines, game.level), f"seed {seed}: replayed lines/level differ"
+    for replay in (env.replay.to_bytes(), game.replay.to_bytes()):
+        result = verify_replay((replay, game.score, lines, game.level))
+        assert result["ok"], f"seed {seed}: {result['error']}"
+    return len(game.replay), game.score
+
+
+if __name__ == "__main__":
+    num_seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    max_pieces = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = LeaderboardDB(os.path.join(tmp, "parity.db"))
+        for seed in range(num_seeds):
+            pieces, score = check_seed(seed, max_pieces, db)
+            print(f"[PARITY] seed {seed}: {pieces} pieces, score {score} - identical")
+    print(f"[PARITY] All {num_seeds} seeds identical across TetrisAI, HeadlessTetrisEnv, TetrisGame and replay")
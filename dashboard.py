@@ -7,123 +7,396 @@ Created on Sat Nov 22 18:04:57 2025
 """
 
 # dashboard.py
+import os
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
+import threading
+
 import streamlit as st
 
 DB_PATH = "tetris_leaderboard.db"
-
-
-def load_data():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(
-        "SELECT id, username, score, timestamp, is_ai, lines_cleared, level FROM leaderboard",
+# Written by export_parquet.py next to the DB; used for bulk loads when present
+PARQUET_DIR = "leaderboard_parquet"
+# Live refresh defaults (sidebar): how often the summary polls for new
+# games, and how often charts are redrawn when some arrived
+REFRESH_S = 2
+CHART_REFRESH_S = 30
+
+ROWS_SQL = (
+    "SELECT id, username, score, ts AS timestamp, is_ai, lines_cleared, level "
+    "FROM leaderboard_epoch WHERE id > ?"
+)
+ROLLUP_TOTALS_SQL = """
+    SELECT p.username, SUM(r.games) AS games, SUM(r.score_sum) AS score_sum,
+           MAX(r.best_score) AS best_score, SUM(r.lines) AS lines,
+           MAX(r.max_level) AS max_level, SUM(r.level_sum) AS level_sum
+    FROM daily_rollups r JOIN players p ON p.id = r.player_id
+    GROUP BY p.username
+"""
+# How player_totals of two row batches combine
+TOTALS_COMBINE = {
+    "games": "sum",
+    "score_sum": "sum",
+    "best_score": "max",
+    "lines": "sum",
+    "max_level": "max",
+    "level_sum": "sum",
+}
+
+_PLT = None
+
+
+def pyplot():
+    """matplotlib.pyplot, imported on the first chart so the summary renders first."""
+    global _PLT
+    if _PLT is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _PLT = plt
+    return _PLT
+
+
+def load_data(db_path: str = None):
+    """
+    Leaderboard rows for the dashboard. When export_parquet.py has exported
+    this DB, the bulk comes from the Parquet export next to it (only the
+    columns used here) and only rows newer than the export's high-water id
+    are read from SQLite. Games that retention.py has since rolled up are
+    dropped from the export. An export of another DB is ignored.
+    """
+    import pandas as pd
+    from db import LeaderboardDB
+
+    db_path = db_path or DB_PATH
+    db = LeaderboardDB(db_path)  # migrate an older schema before reading it
+    parquet_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), PARQUET_DIR)
+
+    last_id = 0
+    frames = []
+    if os.path.isdir(parquet_dir):
+        try:
+            from export_parquet import COLUMNS, export_matches, load_leaderboard, read_state
+        except ImportError:
+            pass  # pyarrow not installed: SQLite only
+        else:
+            state = read_state(parquet_dir)
+            if state["last_id"] and export_matches(state, db.db_uid()):
+                last_id = state["last_id"]
+                frames.append(load_leaderboard(parquet_dir, COLUMNS).to_pandas())
+
+    conn = sqlite3.connect(db_path)
+    recent = pd.read_sql_query(
+        ROWS_SQL,
         conn,
+        params=(last_id,),
     )
+    if frames and conn.execute("SELECT 1 FROM daily_rollups LIMIT 1").fetchone():
+        kept = pd.read_sql_query("SELECT id FROM games WHERE id <= ?", conn, params=(last_id,))["id"]
+        frames[0] = frames[0][frames[0]["id"].isin(kept)]
     conn.close()
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df["player_type"] = df["is_ai"].apply(lambda x: "AI" if x == 1 else "Human")
-    
-    def max_level_per_player_chart(df):
-        max_levels = df.groupby("username")["level"].max().sort_values(ascending=False)
-        fig, ax = plt.subplots()
-        ax.bar(max_levels.index, max_levels.values)
-        ax.set_title("Max Level Reached per Player")
-        ax.set_ylabel("Level")
-        ax.set_xticklabels(max_levels.index, rotation=45, ha="right")
-        st.pyplot(fig)
-        
-    def avg_level_by_type_chart(df):
-        avg_levels = df.groupby("player_type")["level"].mean()
-        fig, ax = plt.subplots()
-        ax.bar(avg_levels.index, avg_levels.values)
-        ax.set_title("Average Level by Player Type")
-        ax.set_ylabel("Average Level")
-        st.pyplot(fig)
+    recent["timestamp"] = pd.to_datetime(recent["timestamp"], unit="s")
+    if not frames or not recent.empty:
+        frames.append(recent)
+
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    df["player_type"] = df["is_ai"].map({1: "AI", 0: "Human"})
 
     return df
 
 
+def player_totals(df):
+    """Per-player sums and maxima behind the Session Summary; they add up across row batches."""
+    return df.groupby("username").agg(
+        games=("score", "size"),
+        score_sum=("score", "sum"),
+        best_score=("score", "max"),
+        lines=("lines_cleared", "sum"),
+        max_level=("level", "max"),
+        level_sum=("level", "sum"),
+    )
+
+
+def rollup_totals(conn):
+    """player_totals of the games retention.py rolled up into daily_rollups."""
+    import pandas as pd
+
+    return pd.read_sql_query(ROLLUP_TOTALS_SQL, conn, index_col="username")
+
+
+def combine_totals(*totals):
+    import pandas as pd
+
+    return pd.concat(totals).groupby(level=0).agg(TOTALS_COMBINE)
+
+
+class LiveLeaderboard:
+    """
+    Dashboard rows kept current by polling instead of reloading.
+
+    refresh() asks a long-lived connection for PRAGMA data_version, which
+    only changes when another connection commits. When it has, rows above
+    the last seen id are appended to df and folded into the per-player
+    totals. If the leaderboard's game count (from score_counts) no longer
+    matches what was appended, rows were deleted or rewritten (retention.py
+    rolling games up, say), and everything is reloaded.
+
+    totals also include rolled-up games; df only has games kept in full.
+
+    One instance is shared by every session (see live_leaderboard); df and
+    totals are replaced, never modified, so readers need no lock.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._data_version = None
+        with self._lock:
+            self._reload()
+
+    def _game_count(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(games), 0) FROM score_counts").fetchone()[0]
+
+    def _reload(self):
+        # Version first: anything committed during the load shows up as a change
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self.df = load_data(self.db_path)
+        self.rollups = rollup_totals(self._conn)
+        self.totals = combine_totals(player_totals(self.df), self.rollups)
+        self.last_id = int(self.df["id"].max()) if len(self.df) else 0
+        # From the rows just loaded, not a second query: a game committed in
+        # between would leave the count ahead of df, and every refresh after
+        # that would reload again
+        self.game_count = len(self.df)
+
+    def refresh(self) -> int:
+        """Take in games committed since the last call; returns how many."""
+        import pandas as pd
+
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return 0
+            self._data_version = version
+            # One read transaction so the new rows and the count agree
+            self._conn.execute("BEGIN")
+            try:
+                new = pd.read_sql_query(ROWS_SQL, self._conn, params=(self.last_id,))
+                game_count = self._game_count()
+            finally:
+                self._conn.execute("COMMIT")
+            if game_count != self.game_count + len(new):
+                self._reload()
+                return len(new)
+            if new.empty:
+                return 0
+
+            new["timestamp"] = pd.to_datetime(new["timestamp"], unit="s")
+            new["player_type"] = new["is_ai"].map({1: "AI", 0: "Human"})
+            self.df = pd.concat([self.df, new], ignore_index=True)
+            self.totals = combine_totals(self.totals, player_totals(new))
+            self.last_id = int(new["id"].max())
+            self.game_count = game_count
+            return len(new)
+
+
+@st.cache_resource(show_spinner=False)
+def live_leaderboard(db_path: str) -> LiveLeaderboard:
+    return LiveLeaderboard(db_path)
+
+
 def top_scores_chart(df):
     top_df = df.sort_values("score", ascending=False).head(10)
-    fig, ax = plt.subplots()
+    fig, ax = pyplot().subplots()
     ax.bar(top_df["username"], top_df["score"])
     ax.set_title("Top 10 Player Scores")
     ax.set_ylabel("Score")
-    ax.set_xticklabels(top_df["username"], rotation=45, ha="right")
-    st.pyplot(fig)
+    ax.set_xticks(range(len(top_df)), top_df["username"], rotation=45, ha="right")
+    return fig
 
 
 def score_over_time_chart(df):
     df_sorted = df.sort_values("timestamp")
-    fig, ax = plt.subplots()
+    fig, ax = pyplot().subplots()
     for ptype, group in df_sorted.groupby("player_type"):
         ax.plot(group["timestamp"], group["score"], marker="o", label=ptype)
     ax.set_title("Score Progression Over Time")
     ax.set_xlabel("Time")
     ax.set_ylabel("Score")
     ax.legend()
-    plt.xticks(rotation=45, ha="right")
-    st.pyplot(fig)
+    ax.tick_params(axis="x", labelrotation=45)
+    return fig
 
 
 def ai_vs_human_chart(df):
     avg_scores = df.groupby("player_type")["score"].mean()
-    fig, ax = plt.subplots()
-    ax.pie(avg_scores, labels=avg_scores.index, autopct="%1.1f%%")
+    fig, ax = pyplot().subplots()
+    if avg_scores.sum() > 0:
+        ax.pie(avg_scores, labels=avg_scores.index, autopct="%1.1f%%")
+    else:
+        # A pie of all-zero wedges has no extent and breaks savefig
+        ax.text(0.5, 0.5, "No points scored yet", ha="center", va="center")
+        ax.set_axis_off()
     ax.set_title("AI vs Human Average Score Share")
-    st.pyplot(fig)
+    return fig
 
 
 def avg_lines_per_player_chart(df):
     avg_lines = df.groupby("username")["lines_cleared"].mean().sort_values(ascending=False)
-    fig, ax = plt.subplots()
+    fig, ax = pyplot().subplots()
     ax.bar(avg_lines.index, avg_lines.values)
     ax.set_title("Average Lines Cleared per Player")
     ax.set_ylabel("Lines Cleared")
-    ax.set_xticklabels(avg_lines.index, rotation=45, ha="right")
-    st.pyplot(fig)
+    ax.set_xticks(range(len(avg_lines)), avg_lines.index, rotation=45, ha="right")
+    return fig
 
 
 def score_vs_lines_scatter(df):
-    fig, ax = plt.subplots()
-    scatter = ax.scatter(df["lines_cleared"], df["score"], c=df["is_ai"].map({0: 0, 1: 1}))
+    fig, ax = pyplot().subplots()
+    ax.scatter(df["lines_cleared"], df["score"], c=df["is_ai"].map({0: 0, 1: 1}))
     ax.set_title("Score vs Lines Cleared")
     ax.set_xlabel("Lines Cleared")
     ax.set_ylabel("Score")
-    st.pyplot(fig)
-    
-    
+    return fig
+
+
 def max_level_per_player_chart(df):
     """Shows highest level reached by each player."""
     max_levels = df.groupby("username")["level"].max().sort_values(ascending=False)
-    
-    fig, ax = plt.subplots()
+
+    fig, ax = pyplot().subplots()
     ax.bar(max_levels.index, max_levels.values)
     ax.set_title("Max Level Reached per Player")
     ax.set_ylabel("Level")
-    ax.set_xticklabels(max_levels.index, rotation=45, ha="right")
-    
-    st.pyplot(fig)
+    ax.set_xticks(range(len(max_levels)), max_levels.index, rotation=45, ha="right")
+    return fig
+
 
 def avg_level_by_type_chart(df):
     """Shows average achieved level for Human vs AI."""
     avg_levels = df.groupby("player_type")["level"].mean()
-    
-    fig, ax = plt.subplots()
+
+    fig, ax = pyplot().subplots()
     ax.bar(avg_levels.index, avg_levels.values)
     ax.set_title("Average Level by Player Type (AI vs Human)")
     ax.set_ylabel("Average Level")
-    
-    st.pyplot(fig)
+    return fig
+
+
+# (section title, chart builder, shown without a click)
+CHART_PANELS = [
+    ("Top Player Scores", top_scores_chart, True),
+    ("Score Progression Over Time", score_over_time_chart, True),
+    ("AI vs Human Performance", ai_vs_human_chart, True),
+    ("Average Lines Cleared per Player", avg_lines_per_player_chart, False),
+    ("Score vs Lines Cleared", score_vs_lines_scatter, False),
+    ("Max Level Reached per Player", max_level_per_player_chart, False),
+    ("Average Level by Player Type (AI vs Human)", avg_level_by_type_chart, False),
+]
+CHART_BUILDERS = {builder.__name__: builder for _, builder, _ in CHART_PANELS}
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def render_chart(chart_name, fingerprint, _df):
+    """
+    PNG bytes of one chart. Cached on (chart_name, fingerprint) only; the
+    frame itself is not hashed, so the fingerprint must change with the data.
+    cache_resource hands back the same bytes object on every hit instead of
+    unpickling a fresh copy per rerun like cache_data would.
+    """
+    import io
+
+    fig = CHART_BUILDERS[chart_name](_df)
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format="png", bbox_inches="tight")
+    finally:
+        pyplot().close(fig)
+    return buf.getvalue()
+
+
+def data_fingerprint(df, selection):
+    """Identifies the rows behind a chart: leaderboard ids only grow."""
+    return (int(df["id"].max()), len(df), selection)
+
+
+def filter_games(df, selected_username, min_percentile):
+    """(rows for the sidebar selection, percentile score threshold or None)."""
+    if selected_username != "All players":
+        df = df[df["username"] == selected_username]
+    threshold = None
+    if min_percentile:
+        from db import LeaderboardDB
+
+        # Read from the leaderboard's score counts, not by sorting df
+        threshold = LeaderboardDB(DB_PATH).score_at_percentile(min_percentile)
+        df = df[df["score"] >= threshold]
+    return df, threshold
+
+
+def summary_panel(live, selected_username, min_percentile):
+    """Session Summary metrics; reruns on its own when live refresh is on."""
+    live.refresh()
+    if min_percentile:
+        # Totals don't split by score, so count the rows (games kept in full)
+        df_filtered, _ = filter_games(live.df, selected_username, min_percentile)
+        totals = player_totals(df_filtered).agg(TOTALS_COMBINE)
+    elif selected_username == "All players":
+        totals = live.totals.agg(TOTALS_COMBINE)
+    elif selected_username in live.totals.index:
+        totals = live.totals.loc[selected_username]
+    else:
+        totals = None
+
+    games_played = int(totals["games"]) if totals is not None else 0
+    if not games_played:
+        st.warning("No records found for this selection.")
+        return
+    best_score = int(totals["best_score"])
+    avg_score = totals["score_sum"] / games_played
+    total_lines = int(totals["lines"])
+    max_level = int(totals["max_level"])
+    avg_level = totals["level_sum"] / games_played
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Games Played", games_played)
+    with col2:
+        st.metric("Best Score", best_score)
+    with col3:
+        st.metric("Average Score", f"{avg_score:.1f}")
+
+    col4, col5, col6 = st.columns(3)
+    with col4:
+        st.metric("Total Lines Cleared", total_lines)
+    with col5:
+        st.metric("Max Level Reached", max_level)
+    with col6:
+        st.metric("Average Level", f"{avg_level:.1f}")
+
+
+def charts_panel(live, selected_username, min_percentile):
+    """Chart panels; reruns on its own (less often than the summary) when live."""
+    live.refresh()
+    df_filtered, _ = filter_games(live.df, selected_username, min_percentile)
+    if df_filtered.empty:
+        return
+    # Rendered once per data fingerprint; collapsed panels are not drawn at all
+    fingerprint = data_fingerprint(df_filtered, (selected_username, min_percentile))
+    for title, builder, shown in CHART_PANELS:
+        st.markdown("---")
+        st.subheader(title)
+        if st.toggle("Show chart", value=shown, key=f"show_{builder.__name__}"):
+            st.image(render_chart(builder.__name__, fingerprint, df_filtered))
 
 
 def main():
     st.title("Tetris Leaderboard Analytics Dashboard")
 
     # ---- Load & filter data ----
-    df = load_data()
+    live = live_leaderboard(DB_PATH)
+    live.refresh()
+    df = live.df
 
     st.sidebar.header("Filters")
     usernames = sorted(df["username"].unique())
@@ -135,10 +408,24 @@ def main():
         index=0,
     )
 
-    if selected_username != "All players":
-        df_filtered = df[df["username"] == selected_username]
-    else:
-        df_filtered = df
+    min_percentile = st.sidebar.slider(
+        "Minimum score percentile",
+        min_value=0,
+        max_value=99,
+        value=0,
+        help="Only games scoring at or above this percentile of all games.",
+    )
+
+    st.sidebar.header("Live refresh")
+    live_on = st.sidebar.toggle("Show new games as they arrive", value=True)
+    refresh_s = st.sidebar.number_input(
+        "Summary refresh (s)", min_value=1, max_value=600, value=REFRESH_S, disabled=not live_on
+    )
+    chart_refresh_s = st.sidebar.number_input(
+        "Chart refresh (s)", min_value=5, max_value=3600, value=CHART_REFRESH_S, disabled=not live_on
+    )
+
+    df_filtered, threshold = filter_games(df, selected_username, min_percentile)
 
     # Guard: no records
     if df_filtered.empty:
@@ -150,32 +437,22 @@ def main():
         st.caption("Showing data for **all players**.")
     else:
         st.caption(f"Showing data for **{selected_username}**.")
+    if min_percentile:
+        st.caption(f"Games scoring **{threshold}** or more (percentile {min_percentile}).")
+    rolled_up = int(live.rollups["games"].sum())
+    if rolled_up:
+        st.caption(
+            f"Totals include **{rolled_up}** older games kept only as daily rollups; "
+            "the table and charts show games kept in full."
+        )
 
     # ---- Session Summary ----
+    # The summary and charts rerun on their own timers when live; the rest of
+    # the page (filters, raw table) only on interaction
     st.markdown("### Session Summary")
-
-    games_played = len(df_filtered)
-    best_score = int(df_filtered["score"].max())
-    avg_score = float(df_filtered["score"].mean())
-    total_lines = int(df_filtered["lines_cleared"].sum())
-    max_level = int(df_filtered["level"].max())
-    avg_level = float(df_filtered["level"].mean())
-
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Games Played", games_played)
-    with col2:
-        st.metric("Best Score", best_score)
-    with col3:
-        st.metric("Average Score", f"{avg_score:.1f}")
-
-    col4, col5, col6 = st.columns(3)
-    with col4:
-        st.metric("Total Lines Cleared", total_lines)
-    with col5:
-        st.metric("Max Level Reached", max_level)
-    with col6:
-        st.metric("Average Level", f"{avg_level:.1f}")
+    st.fragment(summary_panel, run_every=refresh_s if live_on else None)(
+        live, selected_username, min_percentile
+    )
 
     # ---- Raw data ----
     st.markdown("---")
@@ -183,33 +460,9 @@ def main():
     st.dataframe(df_filtered.sort_values("score", ascending=False))
 
     # ---- Charts using df_filtered ----
-    st.markdown("---")
-    st.subheader("Top Player Scores")
-    top_scores_chart(df_filtered)
-
-    st.markdown("---")
-    st.subheader("Score Progression Over Time")
-    score_over_time_chart(df_filtered)
-
-    st.markdown("---")
-    st.subheader("AI vs Human Performance")
-    ai_vs_human_chart(df_filtered)
-
-    st.markdown("---")
-    st.subheader("Average Lines Cleared per Player")
-    avg_lines_per_player_chart(df_filtered)
-
-    st.markdown("---")
-    st.subheader("Score vs Lines Cleared")
-    score_vs_lines_scatter(df_filtered)
-
-    st.markdown("---")
-    st.subheader("Max Level Reached per Player")
-    max_level_per_player_chart(df_filtered)
-
-    st.markdown("---")
-    st.subheader("Average Level by Player Type (AI vs Human)")
-    avg_level_by_type_chart(df_filtered)
+    st.fragment(charts_panel, run_every=chart_refresh_s if live_on else None)(
+        live, selected_username, min_percentile
+    )
 
 
 if __name__ == "__main__":
@@ -7,11 +7,234 @@ Created on Sat Nov 22 17:59:23 2025
 """
 
 # db.py
+import math
 import sqlite3
-from datetime import datetime
-from typing import List, Dict, Any
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from metrics import METRICS, DB_WRITE_SECONDS
 
 DB_PATH = "tetris_leaderboard.db"
+# PRAGMA user_version. 0: the single leaderboard table (init_db.sql and
+# earlier db.py versions). 2: players + games tables behind views.
+# 3: score indexes and the score_counts histogram for rank lookups.
+# 4: games.game_uid, so merged leaderboards can skip games they already have.
+# 5: daily_rollups, where retention.py moves old games.
+# 6: db_info.db_uid, so exports and merges can tell DB files apart.
+# 7: rollup_score_counts, so rolled-up games keep their place in the ranks.
+SCHEMA_VERSION = 7
+
+GAMES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player_id INTEGER NOT NULL REFERENCES players (id),
+        score INTEGER NOT NULL,
+        -- Local wall-clock seconds, not Unix time (see epoch_seconds)
+        ts INTEGER NOT NULL,
+        is_ai INTEGER NOT NULL CHECK (is_ai IN (0, 1)),
+        lines_cleared INTEGER NOT NULL DEFAULT 0,
+        level INTEGER NOT NULL DEFAULT 1,
+        replay BLOB,
+        -- Given once, where the game is first saved; copies of the game in
+        -- other DBs (merge_leaderboards.py) keep it
+        game_uid BLOB NOT NULL UNIQUE DEFAULT (randomblob(16))
+    );
+"""
+
+GAMES_INDEXES = {
+    "games_ts": "ts",
+    "games_player": "player_id",
+    # Leaderboard order (score descending, then oldest first), overall and per segment
+    "games_score": "score DESC",
+    "games_ai_score": "is_ai, score DESC",
+}
+GAMES_INDEX_SQL = "".join(
+    f"    CREATE INDEX IF NOT EXISTS {name} ON games ({columns});\n" for name, columns in GAMES_INDEXES.items()
+)
+COUNT_INSERT_TRIGGER_SQL = """
+    CREATE TRIGGER IF NOT EXISTS games_count_insert AFTER INSERT ON games
+    BEGIN
+        INSERT INTO score_counts (is_ai, score, games) VALUES (NEW.is_ai, NEW.score, 1)
+        ON CONFLICT (is_ai, score) DO UPDATE SET games = games + 1;
+    END;
+"""
+# Games stored and rolled up, per (segment, score): what ranks count
+RANKED_COUNTS_SQL = """(
+    SELECT is_ai, score, games FROM score_counts
+    UNION ALL SELECT is_ai, score, games FROM rollup_score_counts
+)"""
+# Adds games with id > ? to score_counts
+COUNT_GAMES_SQL = """
+    INSERT INTO score_counts (is_ai, score, games)
+    SELECT is_ai, score, COUNT(*) FROM games WHERE id > ? GROUP BY is_ai, score
+    ON CONFLICT (is_ai, score) DO UPDATE SET games = games + excluded.games
+"""
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS players (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE
+    );
+""" + GAMES_TABLE_SQL.format(table="games") + """
+""" + GAMES_INDEX_SQL + """
+    -- Games per (segment, score), kept current by the triggers below.
+    -- Scores are multiples of 100, so this stays small however many games
+    -- there are, and ranks and percentiles are read from it
+    CREATE TABLE IF NOT EXISTS score_counts (
+        is_ai INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        games INTEGER NOT NULL,
+        PRIMARY KEY (is_ai, score)
+    ) WITHOUT ROWID;
+""" + COUNT_INSERT_TRIGGER_SQL + """
+    -- Games removed by retention.py, summed per day (ts of midnight), player
+    -- and segment; same totals as the dashboard's Session Summary
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        day INTEGER NOT NULL,
+        player_id INTEGER NOT NULL REFERENCES players (id),
+        is_ai INTEGER NOT NULL,
+        games INTEGER NOT NULL,
+        score_sum INTEGER NOT NULL,
+        best_score INTEGER NOT NULL,
+        lines INTEGER NOT NULL,
+        max_level INTEGER NOT NULL,
+        level_sum INTEGER NOT NULL,
+        PRIMARY KEY (day, player_id, is_ai)
+    ) WITHOUT ROWID;
+    -- The same games per (segment, score), so ranks and percentiles still
+    -- count them after the games themselves are gone
+    CREATE TABLE IF NOT EXISTS rollup_score_counts (
+        is_ai INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        games INTEGER NOT NULL,
+        PRIMARY KEY (is_ai, score)
+    ) WITHOUT ROWID;
+
+    -- One row: a random id given when the DB is created (or upgraded), so
+    -- export_parquet.py and merge_leaderboards.py can tell which DB file
+    -- they saw before, even when another one replaced it at the same path
+    CREATE TABLE IF NOT EXISTS db_info (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        db_uid BLOB NOT NULL
+    );
+    INSERT OR IGNORE INTO db_info (id, db_uid) VALUES (1, randomblob(16));
+
+    CREATE TRIGGER IF NOT EXISTS games_count_delete AFTER DELETE ON games
+    BEGIN
+        UPDATE score_counts SET games = games - 1 WHERE is_ai = OLD.is_ai AND score = OLD.score;
+        DELETE FROM score_counts WHERE is_ai = OLD.is_ai AND score = OLD.score AND games <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS games_count_update AFTER UPDATE OF score, is_ai ON games
+    BEGIN
+        UPDATE score_counts SET games = games - 1 WHERE is_ai = OLD.is_ai AND score = OLD.score;
+        DELETE FROM score_counts WHERE is_ai = OLD.is_ai AND score = OLD.score AND games <= 0;
+        INSERT INTO score_counts (is_ai, score, games) VALUES (NEW.is_ai, NEW.score, 1)
+        ON CONFLICT (is_ai, score) DO UPDATE SET games = games + 1;
+    END;
+
+    -- Same columns as the old leaderboard table, for existing queries
+    CREATE VIEW IF NOT EXISTS leaderboard AS
+        SELECT g.id, p.username, g.score,
+               strftime('%Y-%m-%dT%H:%M:%S', g.ts, 'unixepoch') AS timestamp,
+               g.is_ai, g.lines_cleared, g.level, g.replay
+        FROM games g JOIN players p ON p.id = g.player_id;
+    -- Timestamps left as integers, for readers that parse them anyway
+    CREATE VIEW IF NOT EXISTS leaderboard_epoch AS
+        SELECT g.id, p.username, g.score, g.ts, g.is_ai, g.lines_cleared, g.level
+        FROM games g JOIN players p ON p.id = g.player_id;
+
+    -- Lets old scripts keep inserting into leaderboard
+    CREATE TRIGGER IF NOT EXISTS leaderboard_insert INSTEAD OF INSERT ON leaderboard
+    BEGIN
+        INSERT OR IGNORE INTO players (username) VALUES (NEW.username);
+        INSERT INTO games (id, player_id, score, ts, is_ai, lines_cleared, level, replay)
+        VALUES (
+            NEW.id,
+            (SELECT id FROM players WHERE username = NEW.username),
+            NEW.score,
+            CAST(strftime('%s', NEW.timestamp) AS INTEGER),
+            NEW.is_ai,
+            COALESCE(NEW.lines_cleared, 0),
+            COALESCE(NEW.level, 1),
+            NEW.replay
+        );
+    END;
+"""
+
+INSERT_PLAYER_SQL = "INSERT OR IGNORE INTO players (username) VALUES (?)"
+# A game whose game_uid is already stored (a retried write) is skipped
+INSERT_GAME_SQL = """
+    INSERT INTO games (player_id, score, ts, is_ai, lines_cleared, level, replay, game_uid)
+    VALUES ((SELECT id FROM players WHERE username = ?), ?, ?, ?, ?, ?, ?, COALESCE(?, randomblob(16)))
+    ON CONFLICT (game_uid) DO NOTHING
+"""
+
+
+def split_sql(script: str) -> List[str]:
+    """
+    Statements of a SQL script, to run one by one inside a transaction
+    (executescript would commit first).
+    """
+    statements, current = [], ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    return statements
+
+
+@contextmanager
+def bulk_games(conn: sqlite3.Connection, expected_rows: int = 0):
+    """
+    For inserting many games in one transaction: the per-row score_counts
+    trigger is dropped while the body runs and the new games are counted
+    with one GROUP BY afterwards. When expected_rows is more than the table
+    already holds, the secondary indexes are dropped too and rebuilt at the
+    end, which beats updating them row by row. If the body raises, roll
+    back; that restores the trigger and indexes too.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    last_id, existing = conn.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM games").fetchone()
+    conn.execute("DROP TRIGGER IF EXISTS games_count_insert")
+    rebuild = expected_rows > existing
+    if rebuild:
+        for name in GAMES_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    yield
+    if rebuild:
+        for statement in split_sql(GAMES_INDEX_SQL):
+            conn.execute(statement)
+    conn.execute(COUNT_GAMES_SQL, (last_id,))
+    conn.execute(COUNT_INSERT_TRIGGER_SQL)
+
+
+def db_uid(conn: sqlite3.Connection, schema: str = "main") -> str:
+    """
+    The random id (hex) of the DB conn is open on, or of the one ATTACHed as
+    `schema`; see db_info in SCHEMA_SQL.
+    """
+    return conn.execute(f"SELECT db_uid FROM {schema}.db_info WHERE id = 1").fetchone()[0].hex()
+
+
+def epoch_seconds(timestamp: Union[str, int, float, None] = None) -> int:
+    """
+    Stored form of a game timestamp: local wall-clock seconds, i.e. the local
+    date and time counted as if it were UTC. This is not Unix time; it is
+    off by the host's UTC offset. Naive ISO strings (as the game has always
+    written them) are taken as they are, so the leaderboard view gives back
+    exactly the string that was saved. Aware ones are converted to local
+    time first. Numbers must already be in this form.
+    """
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    parsed = datetime.now() if timestamp is None else datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone()
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
 
 
 class LeaderboardDB:
@@ -24,50 +247,170 @@ class LeaderboardDB:
 
     def _create_table_if_not_exists(self):
         conn = self._connect()
-        cur = conn.cursor()
-        cur.execute(
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            if not conn.execute("SELECT 1 FROM sqlite_master").fetchone():
+                # Only takes effect before the first table, and outside a
+                # transaction; lets retention.py compact in small steps
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # Autocommit mode so the DDL below runs inside our own transaction;
+            # IMMEDIATE so two processes starting together don't both migrate
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                    self._migrate(conn)
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Create the current schema, moving rows out of an old leaderboard table."""
+        old = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard'"
+        ).fetchone()
+        if old:
+            conn.execute("ALTER TABLE leaderboard RENAME TO leaderboard_v0")
+        games_columns = {row[1] for row in conn.execute("PRAGMA table_info(games)")}
+        if games_columns and "game_uid" not in games_columns:
+            LeaderboardDB._rebuild_games(conn)
+        for statement in split_sql(SCHEMA_SQL):
+            conn.execute(statement)
+        if old:
+            LeaderboardDB._copy_v0(conn)
+        # Games written before the triggers existed are not counted yet
+        conn.execute("DELETE FROM score_counts")
+        conn.execute(COUNT_GAMES_SQL, (0,))
+
+    @staticmethod
+    def _rebuild_games(conn: sqlite3.Connection):
+        """
+        Copy a version 2/3 games table into one with game_uid (ALTER TABLE
+        can't add a column whose default is an expression). Indexes, views
+        and triggers are recreated by SCHEMA_SQL afterwards.
+        """
+        # Views naming games would make the final rename fail
+        conn.execute("DROP VIEW IF EXISTS leaderboard")
+        conn.execute("DROP VIEW IF EXISTS leaderboard_epoch")
+        conn.execute(GAMES_TABLE_SQL.format(table="games_new"))
+        conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS leaderboard (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                score INTEGER NOT NULL,
-                timestamp TEXT NOT NULL,
-                is_ai INTEGER NOT NULL CHECK (is_ai IN (0, 1)),
-                lines_cleared INTEGER NOT NULL DEFAULT 0,
-                level INTEGER NOT NULL DEFAULT 1
-            );
+            INSERT INTO games_new (id, player_id, score, ts, is_ai, lines_cleared, level, replay)
+            SELECT id, player_id, score, ts, is_ai, lines_cleared, level, replay FROM games ORDER BY id
             """
         )
+        # Carry AUTOINCREMENT's counter over, so ids of deleted games are never reused
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'games_new'")
+        conn.execute("UPDATE sqlite_sequence SET name = 'games_new' WHERE name = 'games'")
+        conn.execute("DROP TABLE games")
+        conn.execute("ALTER TABLE games_new RENAME TO games")
 
-        conn.commit()
-        conn.close()
+    @staticmethod
+    def _copy_v0(conn: sqlite3.Connection):
+        """Move the rows of a version 0 leaderboard table into players and games."""
+        # init_db.sql databases have no lines_cleared/level, and only later
+        # ones have replay: fill those with the column defaults
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(leaderboard_v0)")}
+        lines = "lines_cleared" if "lines_cleared" in columns else "0"
+        level = "level" if "level" in columns else "1"
+        replay = "replay" if "replay" in columns else "NULL"
+        conn.execute(
+            "INSERT OR IGNORE INTO players (username) SELECT DISTINCT username FROM leaderboard_v0"
+        )
+        # Ids are kept, so replay results and export high-water marks still match
+        conn.execute(
+            f"""
+            INSERT INTO games (id, player_id, score, ts, is_ai, lines_cleared, level, replay)
+            SELECT o.id, p.id, o.score, COALESCE(CAST(strftime('%s', o.timestamp) AS INTEGER), 0),
+                   o.is_ai, {lines}, {level}, {replay}
+            FROM leaderboard_v0 o JOIN players p ON p.username = o.username
+            ORDER BY o.id
+            """
+        )
+        conn.execute("DROP TABLE leaderboard_v0")
 
-    def insert_score(self, username: str, score: int, is_ai: bool, lines_cleared: int, level: int):
+    def insert_score(
+        self,
+        username: str,
+        score: int,
+        is_ai: bool,
+        lines_cleared: int,
+        level: int,
+        replay: Optional[bytes] = None,
+        timestamp: Union[str, int, None] = None,
+        game_uid: Optional[bytes] = None,
+    ):
+        timed = METRICS.enabled
+        if timed:
+            start = time.perf_counter()
         conn = self._connect()
         cur = conn.cursor()
+        cur.execute(INSERT_PLAYER_SQL, (username,))
         cur.execute(
-            """
-            INSERT INTO leaderboard (username, score, timestamp, is_ai, lines_cleared, level)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
+            INSERT_GAME_SQL,
             (
                 username,
                 score,
-                datetime.now().isoformat(timespec="seconds"),
+                epoch_seconds(timestamp),
                 1 if is_ai else 0,
                 lines_cleared,
                 level,
+                replay,
+                game_uid,
             ),
         )
         conn.commit()
         conn.close()
+        if timed:
+            DB_WRITE_SECONDS.observe(time.perf_counter() - start)
+
+    def insert_scores(self, records: List[Dict[str, Any]]):
+        """
+        Insert several games in one transaction. Each record has the
+        insert_score arguments as keys (replay, timestamp and game_uid
+        optional); games whose game_uid is already stored are skipped.
+        """
+        timed = METRICS.enabled
+        if timed:
+            start = time.perf_counter()
+        now = epoch_seconds()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(INSERT_PLAYER_SQL, [(name,) for name in {r["username"] for r in records}])
+                conn.executemany(
+                    INSERT_GAME_SQL,
+                    [
+                        (
+                            r["username"],
+                            r["score"],
+                            epoch_seconds(r["timestamp"]) if r.get("timestamp") else now,
+                            1 if r["is_ai"] else 0,
+                            r["lines_cleared"],
+                            r["level"],
+                            r.get("replay"),
+                            r.get("game_uid"),
+                        )
+                        for r in records
+                    ],
+                )
+        finally:
+            conn.close()
+        if timed:
+            DB_WRITE_SECONDS.observe(time.perf_counter() - start)
 
 
     def get_all_scores(self) -> List[Dict[str, Any]]:
         conn = self._connect()
         cur = conn.cursor()
         cur.execute(
-            "SELECT id, username, score, timestamp, is_ai, lines_cleared FROM leaderboard"
+            "SELECT id, username, score, timestamp, is_ai, lines_cleared, level FROM leaderboard"
         )
         rows = cur.fetchall()
         conn.close()
@@ -84,3 +427,159 @@ class LeaderboardDB:
             }
             for r in rows
         ]
+
+    def get_replays(self) -> List[Dict[str, Any]]:
+        """Rows that have a stored replay, for replay.verify_leaderboard."""
+        conn = self._connect()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, score, lines_cleared, level, replay FROM games WHERE replay IS NOT NULL"
+        )
+        rows = cur.fetchall()
+        conn.close()
+
+        return [
+            {
+                "id": r[0],
+                "score": r[1],
+                "lines_cleared": r[2],
+                "level": r[3],
+                "replay": r[4],
+            }
+            for r in rows
+        ]
+
+    def db_uid(self) -> str:
+        """This DB file's random id (hex), from db_info."""
+        conn = self._connect()
+        try:
+            return db_uid(conn)
+        finally:
+            conn.close()
+
+    # ---- Rank and percentile ----
+    # Ranks count games with a strictly higher score (ties share a rank),
+    # including games retention.py has rolled up (rollup_score_counts);
+    # is_ai=None ranks against every game, True/False against that segment.
+
+    @staticmethod
+    def _segment(is_ai: Optional[bool]):
+        if is_ai is None:
+            return "", ()
+        return "WHERE is_ai = ?", (1 if is_ai else 0,)
+
+    def rank_of_score(self, score: int, is_ai: Optional[bool] = None) -> Tuple[int, int]:
+        """(rank the score would place at, games ranked), from the per-score counts."""
+        where, params = self._segment(is_ai)
+        conn = self._connect()
+        try:
+            above, total = conn.execute(
+                f"""
+                SELECT COALESCE(SUM(CASE WHEN score > ? THEN games END), 0), COALESCE(SUM(games), 0)
+                FROM {RANKED_COUNTS_SQL} {where}
+                """,
+                (score, *params),
+            ).fetchone()
+        finally:
+            conn.close()
+        return above + 1, total
+
+    def score_at_percentile(self, percentile: float, is_ai: Optional[bool] = None) -> Optional[int]:
+        """
+        Lowest score that at least `percentile`% of games score at or below
+        (50 is the median, 90 the score that enters the top 10%). None when
+        there are no games.
+        """
+        where, params = self._segment(is_ai)
+        conn = self._connect()
+        try:
+            total = conn.execute(
+                f"SELECT COALESCE(SUM(games), 0) FROM {RANKED_COUNTS_SQL} {where}", params
+            ).fetchone()[0]
+            if not total:
+                return None
+            needed = max(1, math.ceil(total * min(max(percentile, 0.0), 100.0) / 100))
+            row = conn.execute(
+                f"""
+                SELECT score FROM (
+                    SELECT score, SUM(games) OVER (ORDER BY score) AS at_or_below
+                    FROM (SELECT score, SUM(games) AS games FROM {RANKED_COUNTS_SQL} {where} GROUP BY score)
+                )
+                WHERE at_or_below >= ? ORDER BY score LIMIT 1
+                """,
+                (*params, needed),
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0]
+
+    def neighbours_around_rank(self, rank: int, k: int = 2, is_ai: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Up to 2k + 1 games around leaderboard rank `rank` (1-based): the first
+        (oldest) game at that rank, the k games placed just above it and the
+        k just below, in score order, oldest first among ties; each with its
+        "rank". A position inside a group of tied games means the group's rank.
+        Only stored games are listed; rolled-up games still count in the ranks,
+        so ranks may skip where they were.
+        """
+        where, params = self._segment(is_ai)
+        conn = self._connect()
+        try:
+            # The score at position `rank`
+            start = conn.execute(
+                f"""
+                SELECT score FROM (
+                    SELECT score, SUM(games) OVER (ORDER BY score DESC) - games AS above, games
+                    FROM (SELECT score, SUM(games) AS games FROM {RANKED_COUNTS_SQL} {where} GROUP BY score)
+                )
+                WHERE above + games >= ? ORDER BY score DESC LIMIT 1
+                """,
+                (*params, max(1, rank)),
+            ).fetchone()
+            if start is None:
+                return []
+            top_score = start[0]
+            segment = "AND is_ai = ?" if params else ""
+            # Keyset seeks on games_score / games_ai_score (score, then id):
+            # backwards from the first game at top_score, then forwards from it
+            before = conn.execute(
+                f"""
+                SELECT id, username, score, timestamp, is_ai, lines_cleared, level
+                FROM leaderboard WHERE score > ? {segment}
+                ORDER BY score, id DESC LIMIT ?
+                """,
+                (top_score, *params, k),
+            ).fetchall()
+            after = conn.execute(
+                f"""
+                SELECT id, username, score, timestamp, is_ai, lines_cleared, level
+                FROM leaderboard WHERE score <= ? {segment}
+                ORDER BY score DESC, id LIMIT ?
+                """,
+                (top_score, *params, k + 1),
+            ).fetchall()
+            rows = before[::-1] + after
+            ranks = {}
+            for score in {r[2] for r in rows}:
+                ranks[score] = 1 + conn.execute(
+                    f"SELECT COALESCE(SUM(games), 0) FROM {RANKED_COUNTS_SQL} WHERE score > ? {segment}",
+                    (score, *params),
+                ).fetchone()[0]
+        finally:
+            conn.close()
+
+        neighbours = []
+        for r in rows:
+            neighbours.append(
+                {
+                    "rank": ranks[r[2]],
+                    "id": r[0],
+                    "username": r[1],
+                    "score": r[2],
+                    "timestamp": r[3],
+                    "is_ai": bool(r[4]),
+                    "lines_cleared": r[5],
+                    "level": r[6],
+                }
+            )
+        return neighbours
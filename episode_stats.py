@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:31 2026
+
+@author: dana-paulette
+
+Per-placement statistics stream for HeadlessTetrisEnv. Records are buffered
+in fixed-size NumPy structured-array chunks and can be appended to a compact
+binary file for offline analysis.
+"""
+
+# episode_stats.py
+import json
+import os
+from typing import List
+
+import numpy as np
+
+PLACEMENT_DTYPE = np.dtype(
+    [
+        ("episode", "<u4"),
+        ("step", "<u4"),
+        ("piece", "u1"),
+        ("rotation", "u1"),
+        ("x", "<i2"),
+        ("y", "<i2"),
+        ("lines", "u1"),
+        ("agg_height", "<u2"),
+        ("holes", "<u2"),
+        ("bumpiness", "<u2"),
+        ("decision_us", "<f4"),
+    ]
+)
+
+FILE_MAGIC = b"TPLC1\n"
+
+
+class PlacementRecorder:
+    """
+    Columnar buffer of placement records.
+    A new chunk is allocated only when the current one fills up.
+    rotation/x/y are where the piece actually locked (blocked rotations and
+    slides already applied), not the AI's plan.
+    """
+
+    def __init__(self, chunk_size: int = 65536, first_episode: int = 0):
+        self.chunk_size = chunk_size
+        self.chunks: List[np.ndarray] = []
+        self._chunk = np.empty(chunk_size, dtype=PLACEMENT_DTYPE)
+        self._n = 0
+        self.episode = first_episode - 1
+        # True until the first episode starts, then whenever one has placements
+        self._episode_dirty = True
+
+    def start_episode(self):
+        # An env reset with no placements since the last one keeps the same id
+        if self._episode_dirty:
+            self.episode += 1
+        self._episode_dirty = False
+
+    def record(self, step, piece, rotation, x, y, lines, agg_height, holes, bumpiness, decision_us):
+        if self._n == self.chunk_size:
+            self.chunks.append(self._chunk)
+            self._chunk = np.empty(self.chunk_size, dtype=PLACEMENT_DTYPE)
+            self._n = 0
+        self._chunk[self._n] = (
+            self.episode, step, piece, rotation, x, y, lines, agg_height, holes, bumpiness, decision_us
+        )
+        self._n += 1
+        self._episode_dirty = True
+
+    def __len__(self):
+        return len(self.chunks) * self.chunk_size + self._n
+
+    def to_array(self) -> np.ndarray:
+        """All records so far as one structured array."""
+        return np.concatenate(self.chunks + [self._chunk[: self._n]])
+
+    def clear(self):
+        self.chunks = []
+        self._n = 0
+
+    def flush_to(self, path: str):
+        """Append buffered records to `path` and empty the buffer."""
+        write_placements(path, self.to_array())
+        self.clear()
+
+
+def write_placements(path: str, records: np.ndarray):
+    """
+    Append records to a placement file, writing the header first if the
+    file is new. Layout: magic, 4-byte header length, JSON dtype header,
+    then raw little-endian records.
+    """
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "ab") as f:
+        if is_new:
+            header = json.dumps({"descr": PLACEMENT_DTYPE.descr}).encode("utf-8")
+            f.write(FILE_MAGIC)
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+        f.write(records.astype(PLACEMENT_DTYPE, copy=False).tobytes())
+
+
+def read_placements(path: str, mmap: bool = True) -> np.ndarray:
+    """Load a placement file; memory-mapped by default so huge files open instantly."""
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a placement stats file")
+        header_len = int.from_bytes(f.read(4), "little")
+        header = json.loads(f.read(header_len))
+    dtype = np.dtype([tuple(field) for field in header["descr"]])
+    offset = len(FILE_MAGIC) + 4 + header_len
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset)
+    return np.fromfile(path, dtype=dtype, offset=offset)
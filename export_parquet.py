@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:02:57 2026
+
+@author: dana-paulette
+
+Columnar export of the leaderboard for offline analysis and the dashboard.
+
+Rows are written as Parquet files partitioned by day and player type
+(hive layout: day=2025-11-20/player_type=ai/...), by default in
+leaderboard_parquet/ next to the DB. Each run appends only rows with an id
+above the high-water mark kept in _export_state.json, so re-running after
+new games is cheap. The state also records which DB (path and db_uid) the
+export came from; exporting a different DB into the same directory starts
+over. Replays are not exported.
+
+Run: python export_parquet.py [--db tetris_leaderboard.db] [--out DIR]
+                              [--placements stats.tplc]
+"""
+
+# export_parquet.py
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from db import DB_PATH, LeaderboardDB
+
+PARQUET_DIR = "leaderboard_parquet"
+STATE_FILE = "_export_state.json"
+COLUMNS = ("id", "username", "score", "timestamp", "is_ai", "lines_cleared", "level")
+PARTITIONING = ds.partitioning(
+    pa.schema([("day", pa.string()), ("player_type", pa.string())]), flavor="hive"
+)
+SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("username", pa.string()),
+        ("score", pa.int64()),
+        ("timestamp", pa.timestamp("s")),
+        ("is_ai", pa.int8()),
+        ("lines_cleared", pa.int64()),
+        ("level", pa.int64()),
+    ]
+)
+
+
+def parquet_dir(db_path: str = DB_PATH) -> str:
+    """Default export directory of a DB: PARQUET_DIR next to the DB file."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), PARQUET_DIR)
+
+
+def export_matches(state: dict, db_uid: str) -> bool:
+    """Whether an export state was written for the DB with this db_uid."""
+    return state.get("db_uid") == db_uid
+
+
+def read_state(out_dir: str) -> dict:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"last_id": 0}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_state(out_dir: str, state: dict):
+    path = os.path.join(out_dir, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def rows_to_table(rows) -> pa.Table:
+    columns = list(zip(*rows))
+    table = pa.table(
+        {
+            "id": pa.array(columns[0], pa.int64()),
+            "username": pa.array(columns[1], pa.string()),
+            "score": pa.array(columns[2], pa.int64()),
+            "timestamp": pc.cast(pa.array(columns[3], pa.int64()), pa.timestamp("s")),
+            "is_ai": pa.array(columns[4], pa.int8()),
+            "lines_cleared": pa.array(columns[5], pa.int64()),
+            "level": pa.array(columns[6], pa.int64()),
+        },
+        schema=SCHEMA,
+    )
+    day = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+    player_type = pc.if_else(pc.equal(table["is_ai"], 1), "ai", "human")
+    return table.append_column("day", day).append_column("player_type", player_type)
+
+
+def export_leaderboard(db_path: str = DB_PATH, out_dir: Optional[str] = None, chunk_rows: int = 500_000) -> int:
+    """
+    Append leaderboard rows newer than the last export; returns rows written.
+    If out_dir holds an export of another DB, it is replaced.
+    """
+    out_dir = out_dir or parquet_dir(db_path)
+    os.makedirs(out_dir, exist_ok=True)
+    state = read_state(out_dir)
+    # Also migrates an older schema before reading it
+    source = {"db_path": os.path.abspath(db_path), "db_uid": LeaderboardDB(db_path).db_uid()}
+    if not export_matches(state, source["db_uid"]):
+        if state["last_id"]:
+            print(f"[EXPORT] {out_dir} holds an export of {state.get('db_path', 'another DB')}; "
+                  f"exporting {db_path} from scratch")
+        # Also clears the files of a first export that never saved its state
+        for name in os.listdir(out_dir):
+            if name.startswith("day="):
+                shutil.rmtree(os.path.join(out_dir, name))
+        state = {"last_id": 0, **source}
+        write_state(out_dir, state)
+    last_id = state["last_id"]
+    written = 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.execute(
+            "SELECT id, username, score, ts, is_ai, lines_cleared, level "
+            "FROM leaderboard_epoch WHERE id > ? ORDER BY id",
+            (last_id,),
+        )
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            table = rows_to_table(rows)
+            ds.write_dataset(
+                table,
+                out_dir,
+                format="parquet",
+                partitioning=PARTITIONING,
+                # Named by the chunk's first id: earlier exports are never
+                # touched, and a chunk re-exported after a crash overwrites itself
+                basename_template=f"part-{rows[0][0]}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            # Advance the high-water mark only once the chunk is on disk
+            last_id = rows[-1][0]
+            written += len(rows)
+            write_state(out_dir, {"last_id": last_id, **source})
+    finally:
+        conn.close()
+    return written
+
+
+def load_leaderboard(out_dir: str, columns=None) -> pa.Table:
+    """
+    Read the export, only the requested columns. Partition columns (day,
+    player_type) can be requested too.
+    """
+    # _placements and _export_state.json are skipped by the default ignore_prefixes
+    dataset = ds.dataset(out_dir, format="parquet", partitioning=PARTITIONING)
+    return dataset.to_table(columns=list(columns) if columns else list(COLUMNS))
+
+
+def export_placements(tplc_path: str, out_dir: str) -> int:
+    """Write an episode_stats placements file next to the leaderboard export."""
+    from episode_stats import read_placements
+
+    records = read_placements(tplc_path, mmap=True)
+    table = pa.table({name: records[name] for name in records.dtype.names})
+    target = os.path.join(out_dir, "_placements")
+    os.makedirs(target, exist_ok=True)
+    name = os.path.splitext(os.path.basename(tplc_path))[0]
+    pq.write_table(table, os.path.join(target, f"{name}.parquet"))
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the leaderboard to partitioned Parquet.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out", default=None, help=f"export directory (default: {PARQUET_DIR} next to the DB)")
+    parser.add_argument("--placements", default=None, help="episode_stats file to export as well")
+    args = parser.parse_args()
+    out_dir = args.out or parquet_dir(args.db)
+
+    start = time.perf_counter()
+    rows = export_leaderboard(args.db, out_dir)
+    elapsed = time.perf_counter() - start
+    print(f"[EXPORT] {rows} new rows to {out_dir} in {elapsed:.2f}s "
+          f"(high-water id {read_state(out_dir)['last_id']})")
+    if args.placements:
+        count = export_placements(args.placements, out_dir)
+        print(f"[EXPORT] {count} placements from {args.placements}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:14:36 2026
+
+@author: dana-paulette
+
+Synthetic leaderboard data for load testing.
+
+Rows follow the game's rules (score = 100 per line, level = 1 + lines // 10)
+with heavy-tailed line counts, a few very active players among many casual
+ones, AI players that clear more lines than humans, and timestamps spread
+over a date range with more games in the evening.
+
+Run: python gen_leaderboard.py --rows 1000000 --db synthetic.db
+"""
+
+# gen_leaderboard.py
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+
+from db import LeaderboardDB, bulk_games, epoch_seconds
+from tetris_rules import level_for_lines, line_score
+
+INSERT_SQL = """
+    INSERT INTO games (player_id, score, ts, is_ai, lines_cleared, level)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+def make_players(num_players: int, ai_share: float, rng: np.random.Generator):
+    """(names, is_ai flags, activity weights). Activity is Zipf-like."""
+    is_ai = rng.random(num_players) < ai_share
+    names = [
+        f"AI_BOT_{i}" if ai else f"player_{i}"
+        for i, ai in enumerate(is_ai)
+    ]
+    weights = 1.0 / np.arange(1, num_players + 1) ** 1.1
+    rng.shuffle(weights)
+    return names, is_ai, weights / weights.sum()
+
+
+def generate_batch(
+    n: int,
+    player_ids: np.ndarray,
+    is_ai: np.ndarray,
+    weights: np.ndarray,
+    start: int,
+    days: int,
+    rng: np.random.Generator,
+):
+    """n games rows (start is an epoch second) as tuples ready for executemany."""
+    player = rng.choice(len(player_ids), size=n, p=weights)
+    ai = is_ai[player]
+
+    # Lines cleared: lognormal body with a Pareto tail; AI clears more
+    lines = rng.lognormal(mean=np.where(ai, 3.4, 2.3), sigma=1.0)
+    tail = rng.random(n) < 0.02
+    lines[tail] *= rng.pareto(1.5, tail.sum()) + 1
+    lines = np.minimum(lines, 100_000).astype(np.int64)
+    # Some games end before the first line
+    lines[rng.random(n) < 0.08] = 0
+
+    # Spread over the range, weighted towards evenings
+    day = rng.integers(0, days, size=n)
+    hour = np.clip(rng.normal(19, 4, size=n), 0, 23.99)
+    ts = start + day * 86400 + (hour * 3600).astype(np.int64)
+
+    return [
+        (p, line_score(ln), t, int(a), ln, level_for_lines(ln))
+        for p, a, ln, t in zip(player_ids[player].tolist(), ai.tolist(), lines.tolist(), ts.tolist())
+    ]
+
+
+def generate(
+    db_path: str,
+    num_rows: int,
+    num_players: int = 20_000,
+    ai_share: float = 0.3,
+    days: int = 365,
+    start: datetime = datetime(2025, 1, 1),
+    seed: int = 0,
+    batch_size: int = 200_000,
+) -> float:
+    """Append num_rows synthetic games to db_path; returns rows per second."""
+    LeaderboardDB(db_path)  # create or migrate the schema
+    rng = np.random.default_rng(seed)
+    names, is_ai, weights = make_players(num_players, ai_share, rng)
+    start_ts = epoch_seconds(start.isoformat())
+
+    conn = sqlite3.connect(db_path)
+    # Bulk load: a crash mid-load loses the synthetic rows, which is fine
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    begin = time.perf_counter()
+    try:
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO players (username) VALUES (?)", [(n,) for n in names])
+            ids = dict(conn.execute("SELECT username, id FROM players"))
+            player_ids = np.array([ids[n] for n in names], dtype=np.int64)
+            with bulk_games(conn, expected_rows=num_rows):
+                for offset in range(0, num_rows, batch_size):
+                    n = min(batch_size, num_rows - offset)
+                    conn.executemany(
+                        INSERT_SQL,
+                        generate_batch(n, player_ids, is_ai, weights, start_ts, days, rng),
+                    )
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - begin
+    return num_rows / elapsed if elapsed > 0 else float("inf")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic leaderboard rows.")
+    parser.add_argument("--db", default="synthetic_leaderboard.db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=20_000)
+    parser.add_argument("--ai-share", type=float, default=0.3)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rate = generate(args.db, args.rows, args.players, args.ai_share, args.days, seed=args.seed)
+    print(f"[GEN] Inserted {args.rows} rows into {args.db} ({rate:,.0f} rows/s)")
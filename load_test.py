@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 20:41:09 2026
+
+@author: dana-paulette
+
+Leaderboard load test: bulk and single-row insert throughput, rank
+lookups, dashboard load_data time and memory, and the time of every
+dashboard panel on a synthetic database (see gen_leaderboard.py).
+
+Run: python load_test.py [--rows 1000000] [--db path] [--out baseline.json]
+"""
+
+# load_test.py
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from db import LeaderboardDB
+from gen_leaderboard import generate
+
+
+def bench_single_inserts(db_path: str, count: int = 200):
+    """Mean seconds per LeaderboardDB.insert_score call (one game at a time)."""
+    db = LeaderboardDB(db_path)
+    start = time.perf_counter()
+    for i in range(count):
+        db.insert_score(f"load_test_{i % 10}", i * 100, i % 2 == 0, i, 1 + i // 10)
+    return (time.perf_counter() - start) / count
+
+
+def bench_rank_queries(db_path: str, count: int = 100):
+    """Mean seconds per rank_of_score / score_at_percentile / neighbours_around_rank call."""
+    db = LeaderboardDB(db_path)
+    _, total = db.rank_of_score(0)
+    calls = {
+        "rank_of_score": lambda i: db.rank_of_score(i * 100),
+        "score_at_percentile": lambda i: db.score_at_percentile(i % 100),
+        "neighbours_around_rank": lambda i: db.neighbours_around_rank(1 + i * total // count),
+    }
+    results = {}
+    for name, call in calls.items():
+        start = time.perf_counter()
+        for i in range(count):
+            call(i)
+        results[name] = (time.perf_counter() - start) / count
+    return results
+
+
+def bench_load_data(db_path: str):
+    """(seconds, tracemalloc peak bytes, DataFrame deep size) of dashboard.load_data."""
+    import dashboard
+
+    dashboard.DB_PATH = db_path
+    start = time.perf_counter()
+    df = dashboard.load_data()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    dashboard.load_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, elapsed, peak, int(df.memory_usage(deep=True).sum())
+
+
+def bench_panels(df):
+    """{panel title: seconds} to build and render each dashboard chart to PNG."""
+    import dashboard
+
+    results = {}
+    start = time.perf_counter()
+    # Session Summary metrics, as computed in dashboard.main
+    len(df), df["score"].max(), df["score"].mean(), df["lines_cleared"].sum()
+    df["level"].max(), df["level"].mean()
+    results["Session Summary"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df.sort_values("score", ascending=False)
+    results["Raw Leaderboard Data (sort)"] = time.perf_counter() - start
+
+    for title, builder, _ in dashboard.CHART_PANELS:
+        start = time.perf_counter()
+        fig = builder(df)
+        fig.savefig(io.BytesIO(), format="png", bbox_inches="tight")
+        dashboard.pyplot().close(fig)
+        results[title] = time.perf_counter() - start
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the leaderboard DB and dashboard.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", default=None, help="existing DB to test (default: generate a temp one)")
+    parser.add_argument("--out", default=None, help="write results as JSON (e.g. a baseline)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "load_test.db")
+            rate = generate(db_path, args.rows)
+            results["bulk_insert_rows_per_s"] = rate
+            print(f"[LOAD] Bulk insert: {args.rows} rows at {rate:,.0f} rows/s")
+
+        per_insert = bench_single_inserts(db_path)
+        results["insert_score_ms"] = per_insert * 1e3
+        print(f"[LOAD] insert_score: {per_insert * 1e3:.2f} ms/call ({1 / per_insert:,.0f} games/s)")
+
+        ranks = bench_rank_queries(db_path)
+        results["rank_queries_ms"] = {name: seconds * 1e3 for name, seconds in ranks.items()}
+        for name, seconds in ranks.items():
+            print(f"[LOAD] {name}: {seconds * 1e3:.2f} ms/call")
+
+        df, elapsed, peak, frame_bytes = bench_load_data(db_path)
+        results.update(
+            rows=len(df),
+            load_data_s=elapsed,
+            load_data_peak_mib=peak / 2**20,
+            dataframe_mib=frame_bytes / 2**20,
+        )
+        print(f"[LOAD] load_data: {len(df)} rows in {elapsed:.2f}s, "
+              f"peak {peak / 2**20:.0f} MiB, frame {frame_bytes / 2**20:.0f} MiB")
+
+        panels = bench_panels(df)
+        results["panels_s"] = panels
+        for title, seconds in panels.items():
+            print(f"[LOAD]   {title:<45} {seconds * 1e3:9.1f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[LOAD] Wrote {args.out}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:05:18 2026
+
+@author: dana-paulette
+
+Merge the leaderboards written by bot-farm nodes into one DB.
+
+Each source is ATTACHed to the target and its new games are copied with
+one INSERT ... SELECT. Games are matched by game_uid, so a game that is
+already in the target is skipped, however it got there. The target keeps
+a per-source high-water id (merge_sources) so re-runs only read games
+added since, along with the source's db_uid: a different DB found at the
+same path is read from the start. Each source is merged in its own
+transaction, together with its high-water mark, so an interrupted merge
+can simply be re-run.
+
+Timestamps are copied as they are: local wall-clock time of the node that
+played the game (see db.epoch_seconds), so nodes should share a timezone
+for the merged games to sort consistently.
+
+Run: python merge_leaderboards.py --into tetris_leaderboard.db node1.db node2.db ...
+"""
+
+# merge_leaderboards.py
+import argparse
+import os
+import sqlite3
+import time
+from typing import Dict, List
+
+from db import DB_PATH, LeaderboardDB, bulk_games, db_uid
+
+SOURCES_SQL = """
+    CREATE TABLE IF NOT EXISTS merge_sources (
+        source TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        db_uid TEXT
+    )
+"""
+CACHE_KIB = 256 * 1024
+# players is small next to games: copy it whole and map source player ids
+# to target ones once, so the games copy joins on integer keys
+COPY_PLAYERS_SQL = "INSERT OR IGNORE INTO main.players (username) SELECT username FROM src.players"
+PLAYER_MAP_SQL = """
+    CREATE TEMP TABLE player_map AS
+    SELECT sp.id AS src_id, tp.id AS id
+    FROM src.players sp JOIN main.players tp ON tp.username = sp.username
+"""
+COPY_GAMES_SQL = """
+    INSERT INTO main.games (player_id, score, ts, is_ai, lines_cleared, level, replay, game_uid)
+    SELECT pm.id, g.score, g.ts, g.is_ai, g.lines_cleared, g.level, g.replay, g.game_uid
+    FROM src.games g JOIN temp.player_map pm ON pm.src_id = g.player_id
+    WHERE g.id > ? AND g.id <= ?
+    ORDER BY g.id
+    ON CONFLICT (game_uid) DO NOTHING
+"""
+
+
+def merge_source(conn: sqlite3.Connection, source: str) -> Dict[str, int]:
+    """Copy one source's games above its high-water mark; returns copied/skipped counts."""
+    key = os.path.abspath(source)
+    conn.execute("ATTACH DATABASE ? AS src", (source,))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            uid = db_uid(conn, "src")
+            row = conn.execute("SELECT last_id, db_uid FROM merge_sources WHERE source = ?", (key,)).fetchone()
+            last_id = row[0] if row else 0
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM src.games").fetchone()[0]
+            if row and (row[1] != uid or max_id < last_id):
+                # A new DB at the same path (or an older copy of the same
+                # one): read it all, game_uid skips repeats
+                last_id = 0
+            offered = conn.execute(
+                "SELECT COUNT(*) FROM src.games WHERE id > ? AND id <= ?", (last_id, max_id)
+            ).fetchone()[0]
+            before = conn.total_changes
+            with bulk_games(conn, expected_rows=offered):
+                conn.execute(COPY_PLAYERS_SQL)
+                players_added = conn.total_changes - before
+                conn.execute(PLAYER_MAP_SQL)
+                conn.execute("CREATE UNIQUE INDEX temp.player_map_src ON player_map (src_id)")
+                conn.execute(COPY_GAMES_SQL, (last_id, max_id))
+                conn.execute("DROP TABLE temp.player_map")
+                copied = conn.total_changes - before - players_added
+            conn.execute(
+                "INSERT INTO merge_sources (source, last_id, db_uid) VALUES (?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id, db_uid = excluded.db_uid",
+                (key, max_id, uid),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute("DETACH DATABASE src")
+    return {"copied": copied, "skipped": offered - copied, "players_added": players_added}
+
+
+def merge(target: str, sources: List[str]) -> Dict[str, Dict[str, int]]:
+    """Merge every source into target, in order; results keyed by source path."""
+    LeaderboardDB(target)
+    results = {}
+    conn = sqlite3.connect(target, isolation_level=None)
+    try:
+        conn.execute(SOURCES_SQL)
+        if "db_uid" not in {row[1] for row in conn.execute("PRAGMA table_info(merge_sources)")}:
+            # Marks from before db_uid match no source, so each is read once in full
+            conn.execute("ALTER TABLE merge_sources ADD COLUMN db_uid TEXT")
+        # Index updates from a big copy touch pages all over the file
+        conn.execute(f"PRAGMA cache_size = -{CACHE_KIB}")
+        for source in sources:
+            if os.path.abspath(source) == os.path.abspath(target):
+                continue
+            # Sources get game_uids (and the current schema) before the first copy
+            LeaderboardDB(source)
+            results[source] = merge_source(conn, source)
+    finally:
+        conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge node leaderboards into one DB.")
+    parser.add_argument("sources", nargs="+", help="leaderboard DBs to merge from")
+    parser.add_argument("--into", default=DB_PATH, help="target leaderboard DB")
+    args = parser.parse_args()
+
+    for source in args.sources:
+        start = time.perf_counter()
+        result = merge(args.into, [source]).get(source)
+        if result is None:
+            print(f"[MERGE] Skipping {source}: it is the target")
+            continue
+        print(f"[MERGE] {source}: {result['copied']} games copied, {result['skipped']} already present, "
+              f"{result['players_added']} new players ({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:31:52 2026
+
+@author: dana-paulette
+
+Opt-in runtime metrics for the game and bot farm: in-process counters and
+histograms, dumped as Prometheus text or JSON over a local HTTP port or to
+a file. Disabled by default; instrumented code checks `METRICS.enabled`
+(one attribute read) before doing any work.
+"""
+
+# metrics.py
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: upper bound of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self.metrics: Dict[str, object] = {}
+        self._server = None
+        self._writer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.path: Optional[str] = None
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for m in self.metrics.values():
+            if isinstance(m, Counter):
+                lines += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} counter", f"{m.name} {m.value}"]
+            else:
+                lines += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} histogram"]
+                cumulative = 0
+                for bound, n in zip(m.buckets, m.counts):
+                    cumulative += n
+                    lines.append(f'{m.name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{m.name}_bucket{{le="+Inf"}} {m.count}')
+                lines.append(f"{m.name}_sum {m.sum}")
+                lines.append(f"{m.name}_count {m.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, object]:
+        uptime = time.time() - self.started
+        data: Dict[str, object] = {"uptime_s": round(uptime, 3)}
+        for m in self.metrics.values():
+            if isinstance(m, Counter):
+                data[m.name] = {"value": m.value, "per_min": round(60 * m.value / uptime, 2) if uptime else 0.0}
+            else:
+                data[m.name] = {
+                    "count": m.count,
+                    "mean": m.sum / m.count if m.count else 0.0,
+                    "p50": m.quantile(0.5),
+                    "p99": m.quantile(0.99),
+                }
+        return data
+
+    def write_file(self, path: Optional[str] = None):
+        """Dump metrics to `path` (.json for JSON, anything else Prometheus text)."""
+        path = path or self.path
+        if not path:
+            return
+        text = json.dumps(self.to_dict(), indent=2) if path.endswith(".json") else self.render_prometheus()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def enable(self, port: Optional[int] = None, path: Optional[str] = None, interval: float = 10.0):
+        """
+        Turn collection on. With `port`, serve /metrics (Prometheus) and
+        /metrics.json on 127.0.0.1; with `path`, rewrite the file every
+        `interval` seconds from a background thread and once more at exit.
+        """
+        self.enabled = True
+        self.path = path
+        if port is not None and self._server is None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            registry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path == "/metrics.json":
+                        body, ctype = json.dumps(registry.to_dict()).encode(), "application/json"
+                    elif self.path == "/metrics":
+                        body, ctype = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", ctype)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        if path and self._writer is None:
+            def write_loop():
+                while not self._stop.wait(interval):
+                    self.write_file()
+
+            self._writer = threading.Thread(target=write_loop, daemon=True)
+            self._writer.start()
+            atexit.register(self.write_file)
+
+    def shutdown(self):
+        """Stop the server and writer, writing the file one last time."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        if self.path:
+            self.write_file()
+
+
+METRICS = MetricsRegistry()
+
+FRAME_SECONDS = METRICS.histogram("tetris_frame_seconds", "Time spent updating and drawing one frame")
+AI_DECISION_SECONDS = METRICS.histogram("tetris_ai_decision_seconds", "TetrisGame.plan_ai_move latency")
+DB_WRITE_SECONDS = METRICS.histogram("tetris_db_write_seconds", "LeaderboardDB.insert_score latency")
+PIECES_LOCKED = METRICS.counter("tetris_pieces_locked_total", "Pieces locked across all games")
+GAMES_FINISHED = METRICS.counter("tetris_games_finished_total", "Games that reached game over")
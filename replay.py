@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:05:48 2026
+
+@author: dana-paulette
+
+Compact game replays and headless replay verification.
+
+A replay is the piece RNG seed plus one (x, y, rotation) placement per locked
+piece, 3 bytes each (TRP1). Boards wider or taller than 255 cells use TRP2,
+with 2-byte board size and x/y (5 bytes per piece). Replaying re-draws the piece sequence from the seed and
+checks, for every piece, that it spawned unblocked (so nothing is placed
+after a top-out) and that its placement rests on the floor or the stack and
+can be reached from spawn with the game's own moves: left, right, soft drop
+and rotating in place. Score, lines and level are recomputed with the shared
+rules in tetris_rules.
+"""
+
+# replay.py
+import argparse
+import random
+import struct
+import time
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import tetris_rules
+from tetris_rules import SHAPES, rotate_shape
+
+REPLAY_MAGIC = b"TRP1"
+HEADER = struct.Struct("<4sQBBI")  # magic, seed, width, height, piece count
+PLACEMENT = struct.Struct("<BBB")  # x, y, rotation
+REPLAY_MAGIC_WIDE = b"TRP2"
+HEADER_WIDE = struct.Struct("<4sQHHI")
+PLACEMENT_WIDE = struct.Struct("<HHB")
+FORMATS = {REPLAY_MAGIC: (HEADER, PLACEMENT), REPLAY_MAGIC_WIDE: (HEADER_WIDE, PLACEMENT_WIDE)}
+MAX_BOARD_SIZE = 0xFFFF
+
+
+def _rotations(shape):
+    shapes = [shape]
+    for _ in range(3):
+        shapes.append(rotate_shape(shapes[-1]))
+    return shapes
+
+
+# ROTATED[piece][rotation] -> shape after that many clockwise turns from spawn,
+# ORIENTATIONS[piece][rotation] -> (row masks, width, column profile)
+ROTATED = [_rotations(shape) for shape in SHAPES]
+ORIENTATIONS = [tetris_rules.orientations(shape) for shape in SHAPES]
+
+
+def _bottom_masks(masks):
+    # Per row, the cells with nothing of the piece below them
+    below = 0
+    bottoms = []
+    for m in reversed(masks):
+        bottoms.append(m & ~below)
+        below |= m
+    return tuple(reversed(bottoms))
+
+
+# BOTTOMS[piece][rotation] -> per-row masks of the piece's lowest cells
+BOTTOMS = [[_bottom_masks(masks) for masks, _, _ in per_piece] for per_piece in ORIENTATIONS]
+
+
+class ReplayRecorder:
+    """Collects placements for one game; `to_bytes()` gives the stored replay."""
+
+    def __init__(self, seed: int, width: int, height: int):
+        if not (0 < width <= MAX_BOARD_SIZE and 0 < height <= MAX_BOARD_SIZE):
+            raise ValueError(
+                f"replays support boards up to {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE}, not {width}x{height}"
+            )
+        self.seed = seed
+        self.width = width
+        self.height = height
+        # The compact format whenever every coordinate fits in a byte
+        self.magic = REPLAY_MAGIC if max(width, height) <= 0xFF else REPLAY_MAGIC_WIDE
+        self._header, self._placement = FORMATS[self.magic]
+        self.placements = bytearray()
+
+    def record(self, x: int, y: int, rotation: int):
+        self.placements += self._placement.pack(x, y, rotation % 4)
+
+    def __len__(self) -> int:
+        return len(self.placements) // self._placement.size
+
+    def last(self) -> Tuple[int, int, int]:
+        """The most recent (x, y, rotation)."""
+        return self._placement.unpack_from(self.placements, len(self.placements) - self._placement.size)
+
+    def to_bytes(self) -> bytes:
+        header = self._header.pack(self.magic, self.seed, self.width, self.height, len(self))
+        return header + bytes(self.placements)
+
+
+def decode_replay(data: bytes):
+    """Returns (seed, width, height, [(x, y, rotation), ...]) for either format."""
+    formats = FORMATS.get(bytes(data[:4]))
+    if formats is None:
+        raise ValueError("not a replay")
+    header, placement = formats
+    _, seed, width, height, count = header.unpack_from(data)
+    body = memoryview(data)[header.size:]
+    if len(body) != count * placement.size:
+        raise ValueError("truncated replay")
+    return seed, width, height, list(placement.iter_unpack(body))
+
+
+class ReplayBoard:
+    """
+    A replay being played back: draws pieces from the seed like the game and
+    the env do, and applies placements with the tetris_rules helpers.
+    """
+
+    def __init__(self, seed: int, width: int, height: int):
+        self.rng = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.board = tetris_rules.new_board(width, height)
+        self.occupancy = [0] * height
+        self.pieces = 0
+        self.lines = 0
+        self.score = 0
+
+    def place(self, x: int, y: int, rotation: int) -> Optional[str]:
+        """Lock the next piece at (x, y, rotation); returns why it is illegal, or None."""
+        i = self.pieces
+        piece = self.rng.randint(0, len(SHAPES) - 1)
+        start_x = tetris_rules.spawn_x(SHAPES[piece], self.width)
+        if not self._fits(piece, start_x, 0, 0):
+            return f"piece {i} placed after the game was over (spawn blocked)"
+        masks, shape_w, _ = ORIENTATIONS[piece][rotation]
+        if x < 0 or x + shape_w > self.width or y < 0 or y + len(masks) > self.height:
+            return f"piece {i} out of bounds"
+        if tetris_rules.collides_masks(self.occupancy, masks, x, y):
+            return f"piece {i} overlaps the stack"
+        # A locked piece must be resting on the floor or the stack
+        if not tetris_rules.collides_masks(self.occupancy, masks, x, y + 1):
+            return f"piece {i} is floating"
+        if not self._reachable(piece, start_x, x, y, rotation):
+            return f"piece {i} cannot reach its placement from spawn"
+
+        tetris_rules.place_piece(self.board, ROTATED[piece][rotation], x, y, piece + 1, self.occupancy)
+        cleared = tetris_rules.clear_lines(self.board, self.occupancy)
+        self.lines += cleared
+        self.score += tetris_rules.line_score(cleared)
+        self.pieces += 1
+        return None
+
+    def _fits(self, piece: int, x: int, y: int, rotation: int) -> bool:
+        masks, shape_w, _ = ORIENTATIONS[piece][rotation]
+        return 0 <= x <= self.width - shape_w and not tetris_rules.collides_masks(self.occupancy, masks, x, y)
+
+    def _reachable(self, piece: int, start_x: int, x: int, y: int, rotation: int) -> bool:
+        # Fast path, as the AI plays: rotate and slide on the spawn row, then drop
+        sx, r = start_x, 0
+        while r != rotation and self._fits(piece, sx, 0, r + 1):
+            r += 1
+        step = 1 if x > sx else -1
+        while r == rotation and sx != x and self._fits(piece, sx + step, 0, r):
+            sx += step
+        if r == rotation and sx == x:
+            # Straight drop: each column is empty from the top down to where
+            # the piece's lowest cell in it locks
+            above = 0
+            for row in self.occupancy[:y]:
+                above |= row
+            for k, bottom in enumerate(BOTTOMS[piece][rotation]):
+                above |= self.occupancy[y + k]
+                if above & (bottom << x):
+                    break
+            else:
+                return True
+
+        # Otherwise search every position the piece can be moved to (tucks, spins)
+        target = (x, y, rotation)
+        seen = {(start_x, 0, 0)}
+        stack = [(start_x, 0, 0)]
+        while stack:
+            state = stack.pop()
+            if state == target:
+                return True
+            px, py, pr = state
+            for move in ((px - 1, py, pr), (px + 1, py, pr), ((px, py, (pr + 1) % 4)), (px, py + 1, pr)):
+                if move not in seen and self._fits(piece, *move):
+                    seen.add(move)
+                    stack.append(move)
+        return False
+
+    @property
+    def level(self) -> int:
+        return tetris_rules.level_for_lines(self.lines)
+
+
+def replay_game(data: bytes) -> Dict[str, Any]:
+    """
+    Re-simulate a replay at full speed.
+    Returns score/lines/level and, for an illegal replay, the failing piece.
+    """
+    seed, width, height, placements = decode_replay(data)
+    replay = ReplayBoard(seed, width, height)
+    for x, y, rotation in placements:
+        error = replay.place(x, y, rotation)
+        if error is not None:
+            return {"valid": False, "error": error}
+
+    return {
+        "valid": True,
+        "error": None,
+        "pieces": replay.pieces,
+        "score": replay.score,
+        "lines": replay.lines,
+        "level": replay.level,
+    }
+
+
+def verify_replay(item: Tuple[bytes, int, int, int]) -> Dict[str, Any]:
+    """Check one (replay, score, lines_cleared, level) tuple against its replay."""
+    data, score, lines, level = item
+    try:
+        result = replay_game(data)
+    except (ValueError, struct.error, IndexError) as e:
+        return {"ok": False, "error": str(e)}
+    if not result["valid"]:
+        return {"ok": False, "error": result["error"]}
+    if (result["score"], result["lines"], result["level"]) != (score, lines, level):
+        return {
+            "ok": False,
+            "error": (
+                f"recorded score/lines/level {score}/{lines}/{level}, "
+                f"replayed {result['score']}/{result['lines']}/{result['level']}"
+            ),
+        }
+    return {"ok": True, "error": None}
+
+
+def verify_many(
+    items: Iterable[Tuple[bytes, int, int, int]],
+    processes: Optional[int] = None,
+    chunksize: int = 64,
+) -> List[Dict[str, Any]]:
+    """Verify replays across a process pool; results keep the input order."""
+    items = list(items)
+    if processes == 1 or len(items) < chunksize:
+        return [verify_replay(item) for item in items]
+    with Pool(processes) as pool:
+        return pool.map(verify_replay, items, chunksize=chunksize)
+
+
+def verify_leaderboard(db_path: str, processes: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+    """Verify every leaderboard row that has a replay; keyed by row id."""
+    from db import LeaderboardDB
+
+    rows = LeaderboardDB(db_path).get_replays()
+    results = verify_many(
+        [(r["replay"], r["score"], r["lines_cleared"], r["level"]) for r in rows],
+        processes=processes,
+    )
+    return {r["id"]: res for r, res in zip(rows, results)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify leaderboard replays.")
+    parser.add_argument("--db", default="tetris_leaderboard.db")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = verify_leaderboard(args.db, processes=args.processes)
+    elapsed = time.perf_counter() - start
+
+    bad = {row_id: res for row_id, res in results.items() if not res["ok"]}
+    for row_id, res in sorted(bad.items()):
+        print(f"[REPLAY] row {row_id}: {res['error']}")
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    print(f"[REPLAY] Verified {len(results)} replays in {elapsed:.2f}s ({rate:.0f}/s), {len(bad)} failed "
+          f"(spawn, reachability, resting position, score/lines/level)")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:12:40 2026
+
+@author: dana-paulette
+
+Leaderboard retention: games older than the retention window are summed
+into daily_rollups (per day, player and AI/human) and deleted, except each
+player's top-K games by score, which are always kept in full. Their scores
+are counted in rollup_score_counts, so leaderboard ranks still include them. The freed
+pages are then returned to the file system with incremental vacuum.
+
+Work is done in small transactions (batch_rows games, then vacuum_pages
+pages at a time) with a pause in between, so the game, the score writer and
+the dashboard keep getting the DB while it runs.
+
+Run: python retention.py [--db tetris_leaderboard.db] [--keep-days 30] [--top-k 10]
+     python retention.py --setup-vacuum   (once, for DBs created before retention)
+"""
+
+# retention.py
+import argparse
+import sqlite3
+import time
+from typing import Dict
+
+from db import DB_PATH, LeaderboardDB, epoch_seconds
+
+DAY_S = 86400
+
+# Games outside the window that are not among their player's top K
+CANDIDATES_SQL = """
+    SELECT id FROM games
+    WHERE id > ? AND ts < ? AND id NOT IN (SELECT id FROM temp.retention_keep)
+    ORDER BY id LIMIT ?
+"""
+BATCH_WHERE = "id BETWEEN ? AND ? AND ts < ? AND id NOT IN (SELECT id FROM temp.retention_keep)"
+ROLLUP_SQL = f"""
+    INSERT INTO daily_rollups (day, player_id, is_ai, games, score_sum, best_score, lines, max_level, level_sum)
+    SELECT ts - ts % {DAY_S}, player_id, is_ai, COUNT(*), SUM(score), MAX(score),
+           SUM(lines_cleared), MAX(level), SUM(level)
+    FROM games WHERE {BATCH_WHERE}
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, player_id, is_ai) DO UPDATE SET
+        games = games + excluded.games,
+        score_sum = score_sum + excluded.score_sum,
+        best_score = MAX(best_score, excluded.best_score),
+        lines = lines + excluded.lines,
+        max_level = MAX(max_level, excluded.max_level),
+        level_sum = level_sum + excluded.level_sum
+"""
+# Scores too, so rank_of_score and friends keep counting these games
+ROLLUP_COUNTS_SQL = f"""
+    INSERT INTO rollup_score_counts (is_ai, score, games)
+    SELECT is_ai, score, COUNT(*) FROM games WHERE {BATCH_WHERE}
+    GROUP BY is_ai, score
+    ON CONFLICT (is_ai, score) DO UPDATE SET games = games + excluded.games
+"""
+DELETE_SQL = f"DELETE FROM games WHERE {BATCH_WHERE}"
+
+
+def roll_up(
+    conn: sqlite3.Connection,
+    keep_days: int,
+    top_k: int,
+    batch_rows: int = 5000,
+    pause: float = 0.05,
+) -> int:
+    """Move games older than keep_days (whole days) into daily_rollups; returns games rolled up."""
+    # In ts's own terms (local wall-clock seconds, not time.time()), so the
+    # window and the rollup days are local days
+    now = epoch_seconds()
+    cutoff = now - now % DAY_S - keep_days * DAY_S
+
+    # Read-only, so outside any write transaction
+    conn.execute("DROP TABLE IF EXISTS temp.retention_keep")
+    conn.execute(
+        """
+        CREATE TEMP TABLE retention_keep AS
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY player_id ORDER BY score DESC, id) AS place
+            FROM games
+        )
+        WHERE place <= ?
+        """,
+        (top_k,),
+    )
+    conn.execute("CREATE UNIQUE INDEX temp.retention_keep_id ON retention_keep (id)")
+
+    rolled = 0
+    last_id = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [row[0] for row in conn.execute(CANDIDATES_SQL, (last_id, cutoff, batch_rows))]
+            if ids:
+                batch = (ids[0], ids[-1], cutoff)
+                conn.execute(ROLLUP_SQL, batch)
+                conn.execute(ROLLUP_COUNTS_SQL, batch)
+                conn.execute(DELETE_SQL, batch)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if not ids:
+            break
+        rolled += len(ids)
+        last_id = ids[-1]
+        time.sleep(pause)
+    conn.execute("DROP TABLE temp.retention_keep")
+    return rolled
+
+
+def compact(conn: sqlite3.Connection, vacuum_pages: int = 1000, pause: float = 0.05) -> int:
+    """Free pages vacuum_pages at a time; returns pages freed (0 without incremental auto_vacuum)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    while True:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            return freed
+        # executescript steps the pragma to completion; execute would free one page
+        conn.executescript(f"PRAGMA incremental_vacuum({min(free, vacuum_pages)})")
+        freed += min(free, vacuum_pages)
+        time.sleep(pause)
+
+
+def apply_retention(
+    db_path: str = DB_PATH,
+    keep_days: int = 30,
+    top_k: int = 10,
+    batch_rows: int = 5000,
+    vacuum_pages: int = 1000,
+    pause: float = 0.05,
+) -> Dict[str, int]:
+    """Roll up, then compact; returns counts and whether incremental vacuum is on."""
+    LeaderboardDB(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        rolled = roll_up(conn, keep_days, top_k, batch_rows, pause)
+        freed = compact(conn, vacuum_pages, pause)
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        conn.close()
+    return {"rolled_up": rolled, "pages_freed": freed, "incremental_vacuum": incremental}
+
+
+def setup_incremental_vacuum(db_path: str = DB_PATH):
+    """Switch an existing DB to incremental auto_vacuum. Runs a full VACUUM, which locks the DB."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll old leaderboard games up by day and compact the DB.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--keep-days", type=int, default=30, help="days of games kept in full")
+    parser.add_argument("--top-k", type=int, default=10, help="best games per player always kept")
+    parser.add_argument("--batch-rows", type=int, default=5000, help="games per transaction")
+    parser.add_argument("--vacuum-pages", type=int, default=1000, help="pages freed per vacuum step")
+    parser.add_argument("--setup-vacuum", action="store_true",
+                        help="one-off: enable incremental vacuum on an older DB (full VACUUM)")
+    args = parser.parse_args()
+
+    if args.setup_vacuum:
+        start = time.perf_counter()
+        setup_incremental_vacuum(args.db)
+        print(f"[RETENTION] Incremental vacuum enabled on {args.db} ({time.perf_counter() - start:.1f}s)")
+    else:
+        start = time.perf_counter()
+        result = apply_retention(args.db, args.keep_days, args.top_k, args.batch_rows, args.vacuum_pages)
+        print(f"[RETENTION] {result['rolled_up']} games rolled up, {result['pages_freed']} pages freed "
+              f"({time.perf_counter() - start:.1f}s)")
+        if not result["incremental_vacuum"] and result["rolled_up"]:
+            print("[RETENTION] Freed space is reused by new games; run with --setup-vacuum once "
+                  "to also shrink the file")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:48:06 2026
+
+@author: dana-paulette
+
+Background leaderboard writer so game over never waits on SQLite.
+
+Scores are queued from the game thread and written in batches by a daemon
+thread, retrying with exponential backoff. Batches that still fail are
+appended to a local spill file (JSON lines) and retried the next time a
+writer starts. close() drains the queue; it is also registered with atexit.
+
+Every game gets a game_uid when it is submitted and keeps it in the spill
+file, so a game written twice (a retried batch, two processes recovering
+the same spill) is stored once. A writer claims the spill by renaming it to
+a name of its own, so only one process recovers each spilled batch.
+"""
+
+# score_writer.py
+import atexit
+import base64
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from db import DB_PATH, LeaderboardDB
+
+SPILL_FILE = "pending_scores.jsonl"
+# A claimed spill this old was left by a writer that died while recovering it
+STALE_CLAIM_S = 60.0
+# Spilled as base64 text
+BINARY_FIELDS = ("replay", "game_uid")
+
+
+class ScoreWriter:
+    def __init__(
+        self,
+        db: Optional[LeaderboardDB] = None,
+        db_path: str = DB_PATH,
+        spill_path: str = SPILL_FILE,
+        retries: int = 4,
+        backoff: float = 0.25,
+        max_backoff: float = 4.0,
+        batch_size: int = 256,
+    ):
+        self.db = db
+        self.db_path = db_path
+        self.spill_path = spill_path
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.written = 0
+        self.spilled = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        username: str,
+        score: int,
+        is_ai: bool,
+        lines_cleared: int,
+        level: int,
+        replay: Optional[bytes] = None,
+        on_written: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Queue one game for writing; returns immediately. on_written, if
+        given, is called on the writer thread once the game is in the DB
+        (never if it ends up in the spill file).
+        """
+        self._queue.put(
+            {
+                "username": username,
+                "score": score,
+                "is_ai": bool(is_ai),
+                "lines_cleared": lines_cleared,
+                "level": level,
+                "replay": replay,
+                "game_uid": os.urandom(16),
+                # Stamped now, not when the write finally lands
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "on_written": on_written,
+            }
+        )
+        self._ensure_started()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self, timeout: float = 10.0):
+        """Write (or spill) everything queued, then stop the worker."""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._closing.set()
+        self._queue.put(None)
+        thread.join(timeout)
+
+    # ---- worker thread ----
+
+    def _run(self):
+        try:
+            self._recover_spill()
+        except Exception as e:  # new scores still get written
+            print(f"[SCORES] Recovering {self.spill_path} failed: {e!r}")
+        while True:
+            item = self._queue.get()
+            batch = []
+            stop = item is None
+            if not stop:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:  # keep the writer alive for every later score
+                    print(f"[SCORES] Dropping {len(batch)} scores after an unexpected error: {e!r}")
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        # No backoff once closing: exit should not hang on a dead DB
+        attempts = 1 if self._closing.is_set() else self.retries + 1
+        for attempt in range(attempts):
+            try:
+                if self.db is None:
+                    self.db = LeaderboardDB(self.db_path)
+                self.db.insert_scores(batch)
+            except sqlite3.Error as e:
+                if attempt + 1 < attempts and not self._closing.is_set():
+                    time.sleep(min(self.max_backoff, self.backoff * 2 ** attempt))
+                else:
+                    print(f"[SCORES] Leaderboard write failed ({e}); spilling {len(batch)} to {self.spill_path}")
+            except Exception as e:
+                # Not the DB but a record: write the rest one by one without it
+                if len(batch) == 1:
+                    print(f"[SCORES] Dropping an unwritable score ({e!r}): {batch[0].get('username')!r}")
+                    return
+                for record in batch:
+                    self._write([record])
+                return
+            else:
+                self.written += len(batch)
+                self._notify(batch)
+                return
+        self._spill(batch)
+
+    @staticmethod
+    def _notify(batch: List[Dict[str, Any]]):
+        for record in batch:
+            callback = record.get("on_written")
+            if callback is not None:
+                try:
+                    callback()
+                except Exception as e:  # a caller's bug must not stop the writer
+                    print(f"[SCORES] on_written callback failed: {e!r}")
+
+    def _spill(self, batch: List[Dict[str, Any]]):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for record in batch:
+                record = dict(record)
+                record.pop("on_written", None)
+                for field in BINARY_FIELDS:
+                    if record.get(field) is not None:
+                        record[field] = base64.b64encode(record[field]).decode("ascii")
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.spilled += len(batch)
+
+    def _claim_spill(self) -> List[str]:
+        """
+        Rename the spill, and claims left by writers that died mid-recovery,
+        to names only this writer uses. A rename succeeds for one process
+        only, so concurrent writers never recover the same file.
+        """
+        candidates = [self.spill_path]
+        now = time.time()
+        # ".retry" is where writers before per-process claims put theirs
+        for path in glob.glob(glob.escape(self.spill_path) + ".*retry"):
+            try:
+                if now - os.path.getmtime(path) >= STALE_CLAIM_S:
+                    candidates.append(path)
+            except OSError:
+                continue
+        claimed = []
+        for path in candidates:
+            claim = f"{self.spill_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.retry"
+            try:
+                os.replace(path, claim)
+                # A rename keeps the old mtime; the claim is fresh from now
+                os.utime(claim)
+            except OSError:
+                continue  # gone, or taken by another writer first
+            claimed.append(claim)
+        return claimed
+
+    def _recover_spill(self):
+        """Write games spilled by an earlier run before any new ones."""
+        # Failures here re-spill into a fresh spill file
+        for claim in self._claim_spill():
+            records = []
+            with open(claim, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from a crash mid-spill
+                    for field in BINARY_FIELDS:
+                        if record.get(field) is not None:
+                            record[field] = base64.b64decode(record[field])
+                    records.append(record)
+            if records:
+                print(f"[SCORES] Retrying {len(records)} spilled scores from {self.spill_path}")
+                for i in range(0, len(records), self.batch_size):
+                    self._write(records[i:i + self.batch_size])
+            try:
+                os.remove(claim)
+            except FileNotFoundError:
+                pass  # re-claimed as stale by another writer; game_uid dedupes its rewrite
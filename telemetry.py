@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:40:09 2026
+
+@author: dana-paulette
+
+Counters, timers and optional per-trial profiling for training runs.
+"""
+
+# telemetry.py
+import cProfile
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+class Telemetry:
+    """
+    Aggregates named counters and timers. Instrumented code holds an
+    Optional[Telemetry] and skips all bookkeeping when it is None.
+    With append=True an existing jsonl_path export is kept and added to
+    (a resumed run); otherwise it is started afresh.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, profile_dir: Optional[str] = None,
+                 profiler: str = "cprofile", append: bool = False):
+        self.counters: Dict[str, int] = {}
+        # name -> [total seconds, calls, max seconds]
+        self.timers: Dict[str, list] = {}
+        self.jsonl_path = jsonl_path
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.started = time.perf_counter()
+        if jsonl_path and not append:
+            # Start a fresh export for this run
+            open(jsonl_path, "w").close()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name: str, seconds: float):
+        entry = self.timers.get(name)
+        if entry is None:
+            self.timers[name] = [seconds, 1, seconds]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the block into profile_dir (no-op without one)."""
+        if not self.profile_dir:
+            yield
+            return
+
+        if self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("[TELEMETRY] pyinstrument not installed, falling back to cProfile")
+            else:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    profiler.stop()
+                    path = os.path.join(self.profile_dir, f"{label}.html")
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(profiler.output_html())
+                return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{label}.prof"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "elapsed_s": round(time.perf_counter() - self.started, 4),
+            "counters": dict(self.counters),
+            "timers": {
+                name: {"total_s": round(total, 6), "calls": calls, "max_s": round(longest, 6)}
+                for name, (total, calls, longest) in self.timers.items()
+            },
+        }
+
+    def export(self, record: Dict[str, Any]):
+        """Append one JSON line to jsonl_path, if set."""
+        if not self.jsonl_path:
+            return
+        with open(self.jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        lines = [f"[TELEMETRY] Wall time {elapsed:.2f}s"]
+        for name, (total, calls, longest) in sorted(self.timers.items(), key=lambda kv: -kv[1][0]):
+            share = 100 * total / elapsed if elapsed > 0 else 0.0
+            lines.append(
+                f"[TELEMETRY]   {name:<20} {total:9.3f}s {share:5.1f}%  "
+                f"{calls:>9} calls  {1e3 * total / calls:8.3f} ms avg  {1e3 * longest:8.3f} ms max"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"[TELEMETRY]   {name:<20} {value}")
+        return "\n".join(lines)
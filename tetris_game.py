@@ -7,13 +7,26 @@ Created on Sat Nov 22 18:02:44 2025
 """
 
 # tetris_game.py
+import argparse
+import numpy as np
 import pygame
 import random
 import sys
 import math
-from typing import List
-from db import LeaderboardDB
-from ai_agent import TetrisAI
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+from replay import ReplayRecorder
+from metrics import METRICS, AI_DECISION_SECONDS, FRAME_SECONDS, GAMES_FINISHED, PIECES_LOCKED
+import tetris_rules
+from tetris_rules import GRID_WIDTH, GRID_HEIGHT, SHAPES
+
+if TYPE_CHECKING:
+    # Imported lazily at runtime: the AI (and its numpy-pickled weights) is
+    # only needed in AI modes, and the DB only when a score is saved
+    from ai_agent import TetrisAI
+    from db import LeaderboardDB
+    from score_writer import ScoreWriter
 
 # ---- Optional sounds for confirmation (safe if files are missing) ----
 CONFIRM_SOUND = None
@@ -32,14 +45,67 @@ def load_sounds():
         CANCEL_SOUND = None
 
 
+# ---- One-time pygame setup shared by the menu and every game ----
+_PYGAME_READY = False
+_FONTS = {}
+_DEFAULT_AI = None
+_SCORE_WRITER = None
+
+
+def init_pygame():
+    """pygame.init() and sound loading, once per process."""
+    global _PYGAME_READY
+    if not _PYGAME_READY:
+        pygame.init()
+        load_sounds()
+        _PYGAME_READY = True
+
+
+def get_font(size: int, bold: bool = False):
+    """Arial at `size`, created on first use (SysFont lookups are slow)."""
+    font = _FONTS.get((size, bold))
+    if font is None:
+        font = _FONTS[(size, bold)] = pygame.font.SysFont("Arial", size, bold=bold)
+    return font
+
+
+def default_ai() -> "TetrisAI":
+    """TetrisAI with the learned weights, loaded on the first AI game."""
+    global _DEFAULT_AI
+    if _DEFAULT_AI is None:
+        from ai_agent import TetrisAI
+        _DEFAULT_AI = TetrisAI()
+    return _DEFAULT_AI
+
+
+def default_score_writer() -> "ScoreWriter":
+    """Background writer for tetris_leaderboard.db, started on the first save."""
+    global _SCORE_WRITER
+    if _SCORE_WRITER is None:
+        from score_writer import ScoreWriter
+        _SCORE_WRITER = ScoreWriter()
+    return _SCORE_WRITER
+
 
 # ==== Game configuration ====
-GRID_WIDTH = 12    # was 10
-GRID_HEIGHT = 22   # was 20
 BLOCK_SIZE = 30
 SCREEN_WIDTH = GRID_WIDTH * BLOCK_SIZE
 SCREEN_HEIGHT = GRID_HEIGHT * BLOCK_SIZE
-FPS = 60
+FPS = 60            # render rate
+SIM_HZ = 60         # simulation ticks per second of game time
+SIM_STEP_MS = 1000 / SIM_HZ
+# Longest real-time gap a single frame catches up on; beyond this (a stalled
+# window, a debugger) the game simply resumes instead of fast-forwarding
+MAX_FRAME_S = 0.25
+# Gravity: ms per row at level 1, speed-up per level, fastest allowed
+BASE_FALL_MS = 500
+FALL_STEP_MS = 40
+MIN_FALL_MS = 120
+# Frame rate while paused or confirming exit: nothing moves, only keys matter
+IDLE_FPS = 10
+# Longest the play-again prompt waits for the "you placed #N" line; the
+# line is still printed whenever the save lands
+PLACEMENT_WAIT_S = 0.5
 
 # ==== Colors ====
 BLACK = (10, 10, 10)
@@ -54,49 +120,61 @@ BLUE = (0, 120, 255)
 ORANGE = (255, 165, 0)
 DARK_BG = (15, 15, 20)
 
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1],
-     [1, 1]],        # O
-    [[0, 1, 0],
-     [1, 1, 1]],     # T
-    [[1, 0, 0],
-     [1, 1, 1]],     # J
-    [[0, 0, 1],
-     [1, 1, 1]],     # L
-    [[1, 1, 0],
-     [0, 1, 1]],     # S
-    [[0, 1, 1],
-     [1, 1, 0]],     # Z
-]
-
+# Indexed like SHAPES; board cells hold the piece id (index + 1)
 SHAPE_COLORS = [CYAN, YELLOW, PURPLE, BLUE, ORANGE, GREEN, RED]
-
-
-def rotate_shape(shape: List[List[int]]) -> List[List[int]]:
-    return [list(row) for row in zip(*shape[::-1])]
+# Board cell value -> color; 0 (empty) is the background
+PALETTE = [DARK_BG] + SHAPE_COLORS
 
 
 class TetrisGame:
-    def __init__(self, username: str, ai_mode: bool = False, demo_mode: bool = False):
-        pygame.init()
-
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    def __init__(
+        self,
+        username: str,
+        ai_mode: bool = False,
+        demo_mode: bool = False,
+        seed: Optional[int] = None,
+        db: Optional["LeaderboardDB"] = None,
+        ai_agent: Optional["TetrisAI"] = None,
+        score_writer: Optional["ScoreWriter"] = None,
+        width: int = GRID_WIDTH,
+        height: int = GRID_HEIGHT,
+        speed: float = 1.0,
+        render_fps: int = FPS,
+    ):
+        init_pygame()
+
+        self.width = width
+        self.height = height
+        self.screen_width = width * BLOCK_SIZE
+        self.screen_height = height * BLOCK_SIZE
+        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption("AI-Powered Tetris")
         self.clock = pygame.time.Clock()
 
         self.username = username
         self.ai_mode = ai_mode
         self.demo_mode = demo_mode
-        self.db = LeaderboardDB()
-        self.ai_agent = TetrisAI()
-        
-        # Ensure optional sounds are loaded
-        load_sounds()
-
-        self.board = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        if score_writer is None and db is not None:
+            from score_writer import ScoreWriter
+            score_writer = ScoreWriter(db=db)
+        self.score_writer = score_writer  # default writer on first save if None
+        if ai_agent is None and ai_mode:
+            ai_agent = default_ai()
+        self.ai_agent = ai_agent
+
+        # Seeded piece sequence so the game can be replayed and verified
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.rng = random.Random(self.seed)
+        self.replay = ReplayRecorder(self.seed, width, height)
+
+        # Piece id per cell (0 = empty), indexes PALETTE when drawing
+        self.board = np.zeros((height, width), dtype=np.uint8)
+        # Row bitmasks kept in sync with self.board; the AI plans on these
+        self.occupancy = [0] * height
+        self.current_piece = 0
         self.current_shape = None
         self.current_color = None
+        self.current_rotation = 0
         self.shape_x = 0
         self.shape_y = 0
         self.score = 0
@@ -105,24 +183,57 @@ class TetrisGame:
         self.game_over = False
         self.paused = False
         self.confirming_exit = False
+        # (rank, games ranked) once the saved score is in the leaderboard
+        self.placement = None
+        self.placed = threading.Event()
 
+        # Fixed-timestep simulation: game time advances in SIM_STEP_MS ticks,
+        # `speed` game seconds per real second; rendering runs at render_fps
+        self.speed = speed
+        self.render_fps = render_fps
+        self.ticks = 0
+        self.fall_time = 0.0
 
 
         self.ai_target_x = None
         self.ai_target_rotations = 0
 
-        self.font_small = pygame.font.SysFont("Arial", 18)
-        self.font_large = pygame.font.SysFont("Arial", 32, bold=True)
+        self.font_small = get_font(18)
+        self.font_large = get_font(32, bold=True)
+
+        # Rendering: the board plus the falling piece is written into _frame,
+        # copied into a one-pixel-per-cell 8-bit surface using PALETTE, and
+        # scaled up over a pre-drawn grid. Empty cells are the colorkey, so
+        # the grid shows through them as it did with per-cell rects.
+        self._frame = np.zeros((height, width), dtype=np.uint8)
+        self._cells = pygame.Surface((width, height), depth=8)
+        self._cells.set_palette(PALETTE)
+        self._scaled = pygame.Surface((self.screen_width, self.screen_height), depth=8)
+        self._scaled.set_palette(PALETTE)
+        self._scaled.set_colorkey(DARK_BG)
+        self._grid = pygame.Surface((self.screen_width, self.screen_height))
+        self._grid.fill(DARK_BG)
+        for y in range(height):
+            for x in range(width):
+                rect = pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
+                pygame.draw.rect(self._grid, GRAY, rect, 1)
+        self._hud_key = None
+        self._hud_blits = None
+        self._paused_key = None
+        self._paused_blits = None
+        self._confirm_blits = None
 
         self.spawn_new_piece()
 
     # ====== Game mechanics ======
 
     def spawn_new_piece(self):
-        idx = random.randint(0, len(SHAPES) - 1)
+        idx = self.rng.randint(0, len(SHAPES) - 1)
+        self.current_piece = idx
         self.current_shape = [row[:] for row in SHAPES[idx]]
         self.current_color = SHAPE_COLORS[idx]
-        self.shape_x = GRID_WIDTH // 2 - len(self.current_shape[0]) // 2
+        self.current_rotation = 0
+        self.shape_x = tetris_rules.spawn_x(self.current_shape, self.width)
         self.shape_y = 0
 
         if self.check_collision(self.current_shape, self.shape_x, self.shape_y):
@@ -132,60 +243,46 @@ class TetrisGame:
             self.plan_ai_move()
 
     def plan_ai_move(self):
-        binary_board = [[1 if cell != 0 else 0 for cell in row] for row in self.board]
-        binary_shape = [[1 if cell != 0 else 0 for cell in row] for row in self.current_shape]
-        rotations, target_x = self.ai_agent.choose_best_move(
-            binary_board, SHAPES, binary_shape
+        timed = METRICS.enabled
+        if timed:
+            start = time.perf_counter()
+        rotations, target_x = self.ai_agent.choose_move(
+            self.occupancy, self.width, self.current_shape
         )
+        if timed:
+            AI_DECISION_SECONDS.observe(time.perf_counter() - start)
         self.ai_target_x = target_x
         self.ai_target_rotations = rotations
 
     def check_collision(self, shape, offset_x, offset_y) -> bool:
-        for y, row in enumerate(shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    bx = offset_x + x
-                    by = offset_y + y
-                    if bx < 0 or bx >= GRID_WIDTH or by < 0 or by >= GRID_HEIGHT:
-                        return True
-                    if self.board[by][bx]:
-                        return True
-        return False
+        return tetris_rules.check_collision(self.board, shape, offset_x, offset_y)
 
     def lock_piece(self):
-        for y, row in enumerate(self.current_shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    self.board[self.shape_y + y][self.shape_x + x] = self.current_color
+        self.replay.record(self.shape_x, self.shape_y, self.current_rotation)
+        tetris_rules.place_piece(
+            self.board,
+            self.current_shape,
+            self.shape_x,
+            self.shape_y,
+            self.current_piece + 1,
+            occupancy=self.occupancy,
+        )
+        if METRICS.enabled:
+            PIECES_LOCKED.inc()
         self.clear_lines()
         self.spawn_new_piece()
-        
-        
 
     def clear_lines(self):
-        new_board = []
-        lines_cleared = 0
-
-        for row in self.board:
-            if all(row):
-                lines_cleared += 1
-            else:
-                new_board.append(row)
-
-        while len(new_board) < GRID_HEIGHT:
-            new_board.insert(0, [0 for _ in range(GRID_WIDTH)])
-
-        self.board = new_board
+        lines_cleared = tetris_rules.clear_lines(self.board, self.occupancy)
         if lines_cleared > 0:
             self.lines_cleared_total += lines_cleared
-            self.score += lines_cleared * 100
+            self.score += tetris_rules.line_score(lines_cleared)
             self.update_level()   # NEW: recalc level when lines increase
 
 
     def update_level(self):
         """Update level based on total lines cleared."""
-        # Example: every 10 lines increases the level by 1
-        self.level = 1 + self.lines_cleared_total // 10
+        self.level = tetris_rules.level_for_lines(self.lines_cleared_total)
 
 
     def move(self, dx: int, dy: int):
@@ -198,22 +295,20 @@ class TetrisGame:
             self.lock_piece()
 
     def rotate(self):
-        rotated = rotate_shape(self.current_shape)
-        if not self.check_collision(rotated, self.shape_x, self.shape_y):
-            self.current_shape = rotated
+        self.current_shape, rotated = tetris_rules.try_rotate(
+            self.board, self.current_shape, self.shape_x, self.shape_y
+        )
+        self.current_rotation += rotated
 
     def hard_drop(self):
-        while not self.check_collision(self.current_shape, self.shape_x, self.shape_y + 1):
-            self.shape_y += 1
+        self.shape_y = tetris_rules.drop_y(self.board, self.current_shape, self.shape_x, self.shape_y)
         self.lock_piece()
 
     # ====== AI control ======
 
     def ai_step(self):
         if self.ai_target_rotations > 0:
-            rotated = rotate_shape(self.current_shape)
-            if not self.check_collision(rotated, self.shape_x, self.shape_y):
-                self.current_shape = rotated
+            self.rotate()
             self.ai_target_rotations -= 1
             return
 
@@ -236,130 +331,174 @@ class TetrisGame:
     # ====== Drawing ======
 
     def draw_board(self):
-        self.screen.fill(DARK_BG)
-
-        # grid lines
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                rect = pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE)
-                pygame.draw.rect(self.screen, GRAY, rect, 1)
-                if self.board[y][x]:
-                    pygame.draw.rect(self.screen, self.board[y][x], rect)
-
-        # current piece
+        # board + current piece, one palette-indexed blit
+        frame = self._frame
+        np.copyto(frame, self.board)
+        piece_id = self.current_piece + 1
         for y, row in enumerate(self.current_shape):
             for x, cell in enumerate(row):
                 if cell:
-                    rect = pygame.Rect(
-                        (self.shape_x + x) * BLOCK_SIZE,
-                        (self.shape_y + y) * BLOCK_SIZE,
-                        BLOCK_SIZE,
-                        BLOCK_SIZE,
-                    )
-                    pygame.draw.rect(self.screen, self.current_color, rect)
-
-        # HUD (score + lines)
-        score_text = self.font_small.render(f"Score: {self.score}", True, WHITE)
-        lines_text = self.font_small.render(
-            f"Lines: {self.lines_cleared_total}", True, WHITE
-        )
-        level_text = self.font_small.render(f"Level: {self.level}", True, WHITE)
-        
-        self.screen.blit(score_text, (5, 5))
-        self.screen.blit(lines_text, (5, 25))
-        self.screen.blit(level_text, (5, 45))
+                    frame[self.shape_y + y, self.shape_x + x] = piece_id
+        pygame.surfarray.blit_array(self._cells, frame.T)
+        pygame.transform.scale(self._cells, (self.screen_width, self.screen_height), self._scaled)
+        self.screen.blit(self._grid, (0, 0))
+        self.screen.blit(self._scaled, (0, 0))
+
+        # HUD (score + lines), re-rendered only when a value changes
+        hud_key = (self.score, self.lines_cleared_total, self.level)
+        if self._hud_key != hud_key:
+            score_text = self.font_small.render(f"Score: {self.score}", True, WHITE)
+            lines_text = self.font_small.render(
+                f"Lines: {self.lines_cleared_total}", True, WHITE
+            )
+            level_text = self.font_small.render(f"Level: {self.level}", True, WHITE)
+            self._hud_blits = [(score_text, (5, 5)), (lines_text, (5, 25)), (level_text, (5, 45))]
+            self._hud_key = hud_key
+        self.screen.blits(self._hud_blits)
 
-        # Pause overlay
+        # Pause / exit-confirmation overlays, rendered once and re-blitted
         if self.paused:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            self.screen.blit(overlay, (0, 0))
-        
-            # Main pause title
-            title = self.font_large.render("PAUSED", True, WHITE)
-            self.screen.blit(
+            self.screen.blits(self.paused_overlay())
+        if self.confirming_exit:
+            self.screen.blits(self.confirm_overlay())
+
+    def paused_overlay(self):
+        """Blit list for the pause screen; rebuilt only when the stats change."""
+        key = (self.username, self.score, self.lines_cleared_total, self.level)
+        if self._paused_key == key:
+            return self._paused_blits
+
+        overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        blits = [(overlay, (0, 0))]
+
+        # Main pause title
+        title = self.font_large.render("PAUSED", True, WHITE)
+        blits.append(
+            (
                 title,
                 (
-                    SCREEN_WIDTH // 2 - title.get_width() // 2,
-                    SCREEN_HEIGHT // 2 - 80,
+                    self.screen_width // 2 - title.get_width() // 2,
+                    self.screen_height // 2 - 80,
                 ),
             )
-        
-            subtitle = self.font_small.render("Press P to resume", True, (220, 220, 220))
-            self.screen.blit(
+        )
+
+        subtitle = self.font_small.render("Press P to resume", True, (220, 220, 220))
+        blits.append(
+            (
                 subtitle,
                 (
-                    SCREEN_WIDTH // 2 - subtitle.get_width() // 2,
-                    SCREEN_HEIGHT // 2 - 50,
+                    self.screen_width // 2 - subtitle.get_width() // 2,
+                    self.screen_height // 2 - 50,
                 ),
             )
-        
-            # Per-player stats
-            stats_lines = [
-                f"Player: {self.username}",
-                f"Score: {self.score}",
-                f"Lines Cleared: {self.lines_cleared_total}",
-                f"Level: {self.level}",
-            ]
-        
-            for i, line in enumerate(stats_lines):
-                stat_surf = self.font_small.render(line, True, (230, 230, 255))
-                self.screen.blit(
+        )
+
+        # Per-player stats
+        stats_lines = [
+            f"Player: {self.username}",
+            f"Score: {self.score}",
+            f"Lines Cleared: {self.lines_cleared_total}",
+            f"Level: {self.level}",
+        ]
+
+        for i, line in enumerate(stats_lines):
+            stat_surf = self.font_small.render(line, True, (230, 230, 255))
+            blits.append(
+                (
                     stat_surf,
                     (
-                        SCREEN_WIDTH // 2 - stat_surf.get_width() // 2,
-                        SCREEN_HEIGHT // 2 - 10 + i * 22,
+                        self.screen_width // 2 - stat_surf.get_width() // 2,
+                        self.screen_height // 2 - 10 + i * 22,
                     ),
                 )
+            )
 
-
-        
-        # Exit confirmation overlay (in-game)
-        if self.confirming_exit:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            self.screen.blit(overlay, (0, 0))
-            msg = "Exit game and save score?"
-            msg2 = "Press Y/Enter to confirm, N/Esc/Q to cancel"
-            msg_surf = self.font_large.render(msg, True, WHITE)
-            msg2_surf = self.font_small.render(msg2, True, (220, 220, 220))
-            self.screen.blit(
+        self._paused_key = key
+        self._paused_blits = blits
+        return blits
+
+    def confirm_overlay(self):
+        """Blit list for the in-game exit confirmation, built on first use."""
+        if self._confirm_blits is not None:
+            return self._confirm_blits
+
+        overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        msg = "Exit game and save score?"
+        msg2 = "Press Y/Enter to confirm, N/Esc/Q to cancel"
+        msg_surf = self.font_large.render(msg, True, WHITE)
+        msg2_surf = self.font_small.render(msg2, True, (220, 220, 220))
+        self._confirm_blits = [
+            (overlay, (0, 0)),
+            (
                 msg_surf,
                 (
-                    SCREEN_WIDTH // 2 - msg_surf.get_width() // 2,
-                    SCREEN_HEIGHT // 2 - msg_surf.get_height(),
+                    self.screen_width // 2 - msg_surf.get_width() // 2,
+                    self.screen_height // 2 - msg_surf.get_height(),
                 ),
-            )
-            self.screen.blit(
+            ),
+            (
                 msg2_surf,
                 (
-                    SCREEN_WIDTH // 2 - msg2_surf.get_width() // 2,
-                    SCREEN_HEIGHT // 2 + 10,
+                    self.screen_width // 2 - msg2_surf.get_width() // 2,
+                    self.screen_height // 2 + 10,
                 ),
-            )
+            ),
+        ]
+        return self._confirm_blits
 
     # ====== Lifecycle ======
 
     def save_score(self):
         print(f"Game over. Score: {self.score}, Lines: {self.lines_cleared_total}, Level: {self.level}")
-        self.db.insert_score(
+        # Queued for the background writer so game over never waits on SQLite
+        if self.score_writer is None:
+            self.score_writer = default_score_writer()
+        self.score_writer.submit(
             self.username,
             self.score,
             self.ai_mode,
             self.lines_cleared_total,
             self.level,
+            replay=self.replay.to_bytes(),
+            on_written=self.report_placement,
         )
 
+    def report_placement(self):
+        """Rank the saved score; called on the score writer thread after the write."""
+        rank, total = self.score_writer.db.rank_of_score(self.score)
+        self.placement = (rank, total)
+        print(f"You placed #{rank} of {total} (top {100 * rank / total:.1f}%)")
+        self.placed.set()
+
+    def tick(self):
+        """Advance the simulation by one SIM_STEP_MS step: gravity, then the AI."""
+        self.ticks += 1
+        self.fall_time += SIM_STEP_MS
+        # compute current speed from level
+        current_speed = max(MIN_FALL_MS, BASE_FALL_MS - (self.level - 1) * FALL_STEP_MS)
+        if self.fall_time >= current_speed:
+            self.move(0, 1)
+            self.fall_time = 0.0
+
+        if self.ai_mode and not self.game_over:
+            self.ai_step()
+
     def run(self):
-        fall_time = 0
-        # base speed settings (tweak to taste)
-        base_speed = 500   # ms at level 1
-        speed_step = 40    # speed up 40 ms per level
-        min_speed = 120    # never go faster than this
+        tick_s = SIM_STEP_MS / 1000
+        accumulator = 0.0
+        last = time.perf_counter()
 
         while True:
-            dt = self.clock.tick(FPS)
-            fall_time += dt
+            idle = self.paused or self.confirming_exit
+            self.clock.tick(IDLE_FPS if idle else self.render_fps)
+            now = time.perf_counter()
+            elapsed, last = min(now - last, MAX_FRAME_S), now
+            timed = METRICS.enabled
+            if timed:
+                frame_start = now
 
             for event in pygame.event.get():
                                     
@@ -370,6 +509,7 @@ class TetrisGame:
                             if CONFIRM_SOUND:
                                 CONFIRM_SOUND.play()
                             self.save_score()
+                            return
                         elif event.key in (pygame.K_n, pygame.K_ESCAPE, pygame.K_q):
                             if CANCEL_SOUND:
                                 CANCEL_SOUND.play()
@@ -400,66 +540,227 @@ class TetrisGame:
                         elif event.key == pygame.K_SPACE:
                             self.hard_drop()
 
-
+            if self.paused:
+                # Paused time is not owed to the simulation
+                accumulator = 0.0
+            elif not self.game_over:
+                # Catch up on every tick this frame's share of game time covers
+                accumulator += elapsed * self.speed
+                while accumulator >= tick_s and not self.game_over:
+                    self.tick()
+                    accumulator -= tick_s
 
             if self.game_over:
+                if timed:
+                    GAMES_FINISHED.inc()
                 self.save_score()
                 return
 
-            if not self.paused:
-                # compute current speed from level
-                current_speed = max(min_speed, base_speed - (self.level - 1) * speed_step)
-                if fall_time >= current_speed:
-                    self.move(0, 1)
-                    fall_time = 0
-
-                if self.ai_mode and not self.game_over:
-                    self.ai_step()
-
             self.draw_board()
             pygame.display.flip()
+            if timed:
+                FRAME_SECONDS.observe(time.perf_counter() - frame_start)
+
+
+# Menu redraw pacing: the title pulse animates at MENU_ANIM_FPS while someone
+# is using the menu, and at MENU_IDLE_FPS after MENU_IDLE_AFTER seconds
+# without input. Between redraws the loop blocks in pygame.event.wait.
+MENU_ANIM_FPS = 15
+MENU_IDLE_FPS = 1
+MENU_IDLE_AFTER = 20.0
+MENU_OPTIONS = ["Human Player", "AI Player", "AI Demo Mode", "Exit"]
+MENU_TITLE_Y = 40
+MENU_OPTIONS_Y = MENU_TITLE_Y + 80 + 2 * 18 + 30
+MENU_OPTION_SPACING = 40
+# Title pulse colors are rendered once per step of the pulse
+MENU_PULSE_STEPS = 48
+
+_MENU_LAYERS = None
+
+
+def menu_layers():
+    """
+    Pre-rendered menu surfaces, built on first use: the static background
+    (gradient, subtitle, badges, instructions), option labels in both
+    states, the exit-confirmation overlay and a cache of title renders.
+    """
+    global _MENU_LAYERS
+    if _MENU_LAYERS is not None:
+        return _MENU_LAYERS
+
+    font_title_sub = get_font(26)
+    font_option = get_font(24)
+    font_hint = get_font(16)      # bottom instructions
+    font_badge = get_font(14)     # top-right badge
+    font_confirm = get_font(22, bold=True)
+
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    # ----- Background with subtle gradient -----
+    background.fill((15, 15, 25))
+    for y in range(0, SCREEN_HEIGHT, 4):
+        shade = 15 + int(40 * (y / SCREEN_HEIGHT))
+        pygame.draw.line(background, (shade, shade, shade + 10), (0, y), (SCREEN_WIDTH, y))
+
+    # ----- Subtitle (the pulsing main title is drawn per frame) -----
+    title_sub = font_title_sub.render("Tetris Game", True, (230, 230, 230))
+    background.blit(
+        title_sub,
+        (SCREEN_WIDTH // 2 - title_sub.get_width() // 2, MENU_TITLE_Y + 40),
+    )
+
+    # ----- Tetris graphic badge under title -----
+    badge_block_size = 18
+    badge_pattern = [
+        [CYAN, None, CYAN, None],
+        [None, YELLOW, GREEN, ORANGE],
+    ]
+    badge_width_px = 4 * badge_block_size
+    badge_start_x = SCREEN_WIDTH // 2 - badge_width_px // 2
+    badge_start_y = MENU_TITLE_Y + 80
+
+    for row_idx, row in enumerate(badge_pattern):
+        for col_idx, color in enumerate(row):
+            if color is not None:
+                rect = pygame.Rect(
+                    badge_start_x + col_idx * badge_block_size,
+                    badge_start_y + row_idx * badge_block_size,
+                    badge_block_size,
+                    badge_block_size,
+                )
+                pygame.draw.rect(background, color, rect, border_radius=3)
+                pygame.draw.rect(background, (20, 20, 30), rect, 2, border_radius=3)
+
+    # ----- Top-right badge: ESC/Q to exit -----
+    badge_surf = font_badge.render("ESC/Q: Exit", True, (255, 255, 255))
+    padding_x, padding_y = 8, 4
+    badge_rect = pygame.Rect(
+        SCREEN_WIDTH - badge_surf.get_width() - padding_x * 2 - 10,
+        10,
+        badge_surf.get_width() + padding_x * 2,
+        badge_surf.get_height() + padding_y * 2,
+    )
+    pygame.draw.rect(background, (30, 30, 50), badge_rect, border_radius=8)
+    pygame.draw.rect(background, (80, 80, 120), badge_rect, 1, border_radius=8)
+    background.blit(badge_surf, (badge_rect.x + padding_x, badge_rect.y + padding_y))
+
+    # ----- Bottom instructions (two lines) -----
+    instructions_lines = [
+        "Use ↑ / ↓ to choose • ENTER to start",
+        "Select 'Exit' or press ESC/Q to quit • P pauses in game",
+    ]
+
+    overlay_height = 70
+    overlay = pygame.Surface((SCREEN_WIDTH, overlay_height), pygame.SRCALPHA)
+    overlay.fill((0, 0, 0, 170))
+    background.blit(overlay, (0, SCREEN_HEIGHT - overlay_height))
+
+    for i, line in enumerate(instructions_lines):
+        hint_surf = font_hint.render(line, True, (255, 255, 255))
+        y = SCREEN_HEIGHT - overlay_height + 10 + i * (font_hint.get_height() + 4)
+        background.blit(hint_surf, (SCREEN_WIDTH // 2 - hint_surf.get_width() // 2, y))
+
+    # ----- Option labels, (normal, selected) -----
+    options = [
+        (font_option.render(opt, True, (190, 190, 190)), font_option.render(opt, True, (255, 255, 255)))
+        for opt in MENU_OPTIONS
+    ]
+
+    # ----- Exit confirmation overlay (menu-level) -----
+    confirm = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    confirm.fill((0, 0, 0, 190))
+    msg_surf = font_confirm.render("Exit IT Expert Group 2 Tetris Game?", True, (255, 255, 255))
+    msg2_surf = font_hint.render("Y or Enter = Yes   •   N / Esc / Q = No", True, (200, 220, 255))
+    confirm.blit(
+        msg_surf,
+        (SCREEN_WIDTH // 2 - msg_surf.get_width() // 2, SCREEN_HEIGHT // 2 - msg_surf.get_height()),
+    )
+    confirm.blit(
+        msg2_surf,
+        (SCREEN_WIDTH // 2 - msg2_surf.get_width() // 2, SCREEN_HEIGHT // 2 + 12),
+    )
+
+    _MENU_LAYERS = {"background": background, "options": options, "confirm": confirm, "titles": {}}
+    return _MENU_LAYERS
+
+
+def menu_title(layers, elapsed: float):
+    """Main title in the pulsing accent color for `elapsed` seconds."""
+    # ----- Dynamic accent color for title (soft pulsing) -----
+    phase = int((elapsed / (2 * math.pi)) % 1.0 * MENU_PULSE_STEPS)
+    title = layers["titles"].get(phase)
+    if title is None:
+        pulse = (math.sin(2 * math.pi * phase / MENU_PULSE_STEPS) + 1) / 2  # 0..1
+        accent_r = int(80 + 120 * pulse)
+        accent_g = int(120 + 80 * (1 - pulse))
+        accent_b = 255
+        accent_color = (accent_r, accent_g, accent_b)
+        title = layers["titles"][phase] = get_font(34, bold=True).render("IT Expert Group 2", True, accent_color)
+    return title
+
+
+def draw_menu(screen, layers, selected: int, confirming_exit: bool, elapsed: float):
+    screen.blit(layers["background"], (0, 0))
+
+    # ----- Title -----
+    title_main = menu_title(layers, elapsed)
+    screen.blit(title_main, (SCREEN_WIDTH // 2 - title_main.get_width() // 2, MENU_TITLE_Y))
 
+    # ----- Menu options -----
+    for i, (normal, highlighted) in enumerate(layers["options"]):
+        y = MENU_OPTIONS_Y + i * MENU_OPTION_SPACING
+        if i == selected:
+            highlight_rect = pygame.Rect(SCREEN_WIDTH // 2 - 160, y - 4, 320, 32)
+            pygame.draw.rect(screen, (40, 40, 70), highlight_rect, border_radius=10)
+            opt_surf = highlighted
+        else:
+            opt_surf = normal
+        screen.blit(opt_surf, (SCREEN_WIDTH // 2 - opt_surf.get_width() // 2, y))
 
-def show_menu():       
-    pygame.init()
+    if confirming_exit:
+        screen.blit(layers["confirm"], (0, 0))
+
+
+def show_menu():
+    init_pygame()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("IT Expert Group 2 Tetris Game")
-    clock = pygame.time.Clock()
-    
-    # Load optional sounds once
-    load_sounds()
-
-    # Fonts
-    font_title_main = pygame.font.SysFont("Arial", 34, bold=True)
-    font_title_sub = pygame.font.SysFont("Arial", 26)
-    font_option = pygame.font.SysFont("Arial", 24)
-    font_hint = pygame.font.SysFont("Arial", 16)      # bottom instructions
-    font_badge = pygame.font.SysFont("Arial", 14)     # top-right badge
-    font_confirm = pygame.font.SysFont("Arial", 22, bold=True)
+    layers = menu_layers()
 
     # Add Exit as fourth option
-    options = ["Human Player", "AI Player", "AI Demo Mode", "Exit"]
+    options = MENU_OPTIONS
     selected = 0
     username = "Player"
 
-    # Animation timer for dynamic accent colors
-    t = 0
+    # Animation clock for dynamic accent colors
+    start = time.monotonic()
+    last_input = start
 
     # Exit confirmation state
     confirming_exit = False
 
     while True:
-        clock.tick(30)
-        t += 1
+        draw_menu(screen, layers, selected, confirming_exit, time.monotonic() - start)
+        pygame.display.flip()
 
-        for event in pygame.event.get():
+        # Sleep until input or the next animation tick
+        idle = time.monotonic() - last_input > MENU_IDLE_AFTER
+        timeout_ms = 1000 // (MENU_IDLE_FPS if idle else MENU_ANIM_FPS)
+        first = pygame.event.wait(timeout_ms)
+        events = [first] + pygame.event.get() if first.type != pygame.NOEVENT else []
+
+        for event in events:
         
             if event.type == pygame.KEYDOWN:
+                last_input = time.monotonic()
                 # If we're in the exit-confirmation dialog, only handle Y/N here
                 if confirming_exit:
                     if event.key in (pygame.K_y, pygame.K_RETURN):
                         if CONFIRM_SOUND:
                             CONFIRM_SOUND.play()
+                        # sys.exit runs the score writer's atexit drain
+                        pygame.quit()
+                        sys.exit()
                     elif event.key in (pygame.K_n, pygame.K_ESCAPE, pygame.K_q):
                         if CANCEL_SOUND:
                             CANCEL_SOUND.play()
@@ -511,160 +812,39 @@ def show_menu():
                         confirming_exit = True
 
 
-        # ----- Background with subtle gradient -----
-        screen.fill((15, 15, 25))
-        for y in range(0, SCREEN_HEIGHT, 4):
-            shade = 15 + int(40 * (y / SCREEN_HEIGHT))
-            pygame.draw.line(screen, (shade, shade, shade + 10), (0, y), (SCREEN_WIDTH, y))
-
-        # ----- Dynamic accent color for title (soft pulsing) -----
-        pulse = (math.sin(t / 30.0) + 1) / 2  # 0..1
-        accent_r = int(80 + 120 * pulse)
-        accent_g = int(120 + 80 * (1 - pulse))
-        accent_b = 255
-        accent_color = (accent_r, accent_g, accent_b)
-
-        # ----- Title -----
-        title_main = font_title_main.render("IT Expert Group 2", True, accent_color)
-        title_sub = font_title_sub.render("Tetris Game", True, (230, 230, 230))
-
-        title_y = 40
-        screen.blit(
-            title_main,
-            (SCREEN_WIDTH // 2 - title_main.get_width() // 2, title_y),
-        )
-        screen.blit(
-            title_sub,
-            (SCREEN_WIDTH // 2 - title_sub.get_width() // 2, title_y + 40),
-        )
-
-        # ----- Tetris graphic badge under title -----
-        badge_block_size = 18
-        badge_pattern = [
-            [CYAN, None, CYAN, None],
-            [None, YELLOW, GREEN, ORANGE],
-        ]
-        badge_width_px = 4 * badge_block_size
-        badge_height_px = 2 * badge_block_size
-        badge_start_x = SCREEN_WIDTH // 2 - badge_width_px // 2
-        badge_start_y = title_y + 80
-
-        for row_idx, row in enumerate(badge_pattern):
-            for col_idx, color in enumerate(row):
-                if color is not None:
-                    rect = pygame.Rect(
-                        badge_start_x + col_idx * badge_block_size,
-                        badge_start_y + row_idx * badge_block_size,
-                        badge_block_size,
-                        badge_block_size,
-                    )
-                    pygame.draw.rect(screen, color, rect, border_radius=3)
-                    pygame.draw.rect(screen, (20, 20, 30), rect, 2, border_radius=3)
-
-        # ----- Menu options -----
-        start_y = badge_start_y + badge_height_px + 30
-        spacing = 40
-
-        for i, opt in enumerate(options):
-            if i == selected:
-                highlight_rect = pygame.Rect(
-                    SCREEN_WIDTH // 2 - 160,
-                    start_y + i * spacing - 4,
-                    320,
-                    32,
-                )
-                pygame.draw.rect(screen, (40, 40, 70), highlight_rect, border_radius=10)
-                color = (255, 255, 255)
-            else:
-                color = (190, 190, 190)
-
-            opt_surf = font_option.render(opt, True, color)
-            screen.blit(
-                opt_surf,
-                (SCREEN_WIDTH // 2 - opt_surf.get_width() // 2, start_y + i * spacing),
-            )
-
-        # ----- Top-right badge: ESC/Q to exit -----
-        badge_text = "ESC/Q: Exit"
-        badge_surf = font_badge.render(badge_text, True, (255, 255, 255))
-        padding_x, padding_y = 8, 4
-        badge_rect = pygame.Rect(
-            SCREEN_WIDTH - badge_surf.get_width() - padding_x * 2 - 10,
-            10,
-            badge_surf.get_width() + padding_x * 2,
-            badge_surf.get_height() + padding_y * 2,
-        )
-        pygame.draw.rect(screen, (30, 30, 50), badge_rect, border_radius=8)
-        pygame.draw.rect(screen, (80, 80, 120), badge_rect, 1, border_radius=8)
-        screen.blit(
-            badge_surf,
-            (badge_rect.x + padding_x, badge_rect.y + padding_y),
-        )
-
-        # ----- Bottom instructions (two lines) -----
-        instructions_lines = [
-            "Use ↑ / ↓ to choose • ENTER to start",
-            "Select 'Exit' or press ESC/Q to quit • P pauses in game",
-        ]
-
-        overlay_height = 70
-        overlay = pygame.Surface((SCREEN_WIDTH, overlay_height), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 170))
-        screen.blit(overlay, (0, SCREEN_HEIGHT - overlay_height))
-
-        for i, line in enumerate(instructions_lines):
-            hint_surf = font_hint.render(line, True, (255, 255, 255))
-            y = SCREEN_HEIGHT - overlay_height + 10 + i * (font_hint.get_height() + 4)
-            screen.blit(
-                hint_surf,
-                (SCREEN_WIDTH // 2 - hint_surf.get_width() // 2, y),
-            )
-
-        # ----- Exit confirmation overlay (menu-level) -----
-
-        if confirming_exit:
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 190))
-            screen.blit(overlay, (0, 0))
-        
-            msg = "Exit IT Expert Group 2 Tetris Game?"
-            msg2 = "Y or Enter = Yes   •   N / Esc / Q = No"
-        
-            msg_surf = font_confirm.render(msg, True, (255, 255, 255))
-            msg2_surf = font_hint.render(msg2, True, (200, 220, 255))
-        
-            screen.blit(
-                msg_surf,
-                (
-                    SCREEN_WIDTH // 2 - msg_surf.get_width() // 2,
-                    SCREEN_HEIGHT // 2 - msg_surf.get_height(),
-                ),
-            )
-            screen.blit(
-                msg2_surf,
-                (
-                    SCREEN_WIDTH // 2 - msg2_surf.get_width() // 2,
-                    SCREEN_HEIGHT // 2 + 12,
-                ),
-            )
-
-
-        pygame.display.flip()
-
-
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI-Powered Tetris")
+    parser.add_argument("--width", type=int, default=GRID_WIDTH, help="board columns")
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT, help="board rows")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="game seconds per real second (e.g. 4 to watch AI games faster)")
+    parser.add_argument("--render-fps", type=int, default=FPS, help="frames drawn per second")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve runtime metrics on 127.0.0.1:PORT (/metrics, /metrics.json)")
+    parser.add_argument("--metrics-file", default=None,
+                        help="periodically dump runtime metrics here (.json for JSON, else Prometheus text)")
+    args = parser.parse_args()
+    if args.metrics_port is not None or args.metrics_file:
+        METRICS.enable(port=args.metrics_port, path=args.metrics_file)
+    game_options = {
+        "width": args.width,
+        "height": args.height,
+        "speed": args.speed,
+        "render_fps": args.render_fps,
+    }
+
     while True:
         mode, username = show_menu()
 
         if mode == "human":
-            game = TetrisGame(username=username, ai_mode=False, demo_mode=False)
+            game = TetrisGame(username=username, ai_mode=False, demo_mode=False, **game_options)
         elif mode == "ai":
-            game = TetrisGame(username=username, ai_mode=True, demo_mode=False)
+            game = TetrisGame(username=username, ai_mode=True, demo_mode=False, **game_options)
         else:  # demo
-            game = TetrisGame(username="AI_DEMO", ai_mode=True, demo_mode=True)
+            game = TetrisGame(username="AI_DEMO", ai_mode=True, demo_mode=True, **game_options)
 
         game.run()  # returns after saving score
+        game.placed.wait(PLACEMENT_WAIT_S)
 
         # Ask if the user wants to play again
         answer = input("\nPlay again? (y/n): ").strip().lower()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:20:37 2026
+
+@author: dana-paulette
+
+Shared Tetris rules used by TetrisGame, HeadlessTetrisEnv and TetrisAI.
+
+Board representation: a list of rows, each a list of ints. 0 is an empty
+cell, any other value is occupied; the game and the env store the piece id
+(SHAPES index + 1) so the renderer can look up its color.
+
+TetrisGame stores the same cell values in a 2-D uint8 NumPy array (rows
+first) so it can be rendered through a palette; the helpers here only index
+board[y][x], so they accept either form.
+
+Alongside the board, the game and the env keep an occupancy view: one int
+bitmask per row, bit x set when column x is filled. place_piece and
+clear_lines keep it in sync, and TetrisAI searches on it directly.
+"""
+
+# tetris_rules.py
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+Board = List[List[int]]
+Shape = List[List[int]]
+Occupancy = List[int]
+
+GRID_WIDTH = 12    # was 10
+GRID_HEIGHT = 22   # was 20
+
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1],
+     [1, 1]],        # O
+    [[0, 1, 0],
+     [1, 1, 1]],     # T
+    [[1, 0, 0],
+     [1, 1, 1]],     # J
+    [[0, 0, 1],
+     [1, 1, 1]],     # L
+    [[1, 1, 0],
+     [0, 1, 1]],     # S
+    [[0, 1, 1],
+     [1, 1, 0]],     # Z
+]
+
+
+def new_board(width: int = GRID_WIDTH, height: int = GRID_HEIGHT) -> Board:
+    return [[0] * width for _ in range(height)]
+
+
+def board_to_occupancy(board: Board) -> Occupancy:
+    return [sum(1 << x for x, cell in enumerate(row) if cell) for row in board]
+
+
+def shape_masks(shape: Shape) -> Tuple[int, ...]:
+    """Row bitmasks of a shape, bit x set for column x."""
+    return tuple(sum(1 << x for x, cell in enumerate(row) if cell) for row in shape)
+
+
+def column_profile(shape: Shape) -> Optional[Tuple[Tuple[int, int], ...]]:
+    """
+    (top row, bottom row) of the filled cells in each shape column, or None
+    if some column has a gap (then the closed-form drop does not apply).
+    """
+    profile = []
+    for x in range(len(shape[0])):
+        filled = [y for y, row in enumerate(shape) if row[x]]
+        if not filled or filled[-1] - filled[0] + 1 != len(filled):
+            return None
+        profile.append((filled[0], filled[-1]))
+    return tuple(profile)
+
+
+@lru_cache(maxsize=None)
+def _orientations(shape_key: Tuple[Tuple[int, ...], ...]):
+    result = []
+    shape = [list(row) for row in shape_key]
+    for _ in range(4):
+        result.append((shape_masks(shape), len(shape[0]), column_profile(shape)))
+        shape = rotate_shape(shape)
+    return tuple(result)
+
+
+def orientations(shape: Shape):
+    """
+    (row masks, width, column profile) for 0-3 clockwise rotations of
+    `shape`, cached per shape.
+    """
+    return _orientations(tuple(tuple(1 if cell else 0 for cell in row) for row in shape))
+
+
+def column_surfaces(occupancy: Occupancy, width: int) -> List[int]:
+    """Row index of the topmost filled cell in each column (len(occupancy) if empty)."""
+    surfaces = [len(occupancy)] * width
+    full = (1 << width) - 1
+    seen = 0
+    for y, m in enumerate(occupancy):
+        new = m & ~seen
+        while new:
+            low = new & -new
+            surfaces[low.bit_length() - 1] = y
+            new ^= low
+        seen |= m
+        if seen == full:
+            break
+    return surfaces
+
+
+def rotate_shape(shape: Shape) -> Shape:
+    # Rotate 90 degrees clockwise
+    return [list(row) for row in zip(*shape[::-1])]
+
+
+def spawn_x(shape: Shape, width: int = GRID_WIDTH) -> int:
+    return width // 2 - len(shape[0]) // 2
+
+
+def check_collision(board: Board, shape: Shape, offset_x: int, offset_y: int) -> bool:
+    height = len(board)
+    width = len(board[0])
+    for y, row in enumerate(shape):
+        by = offset_y + y
+        for x, cell in enumerate(row):
+            if cell:
+                bx = offset_x + x
+                if bx < 0 or bx >= width or by < 0 or by >= height:
+                    return True
+                if board[by][bx]:
+                    return True
+    return False
+
+
+def drop_y(board: Board, shape: Shape, offset_x: int, offset_y: int) -> int:
+    """Row the piece comes to rest on when hard-dropped from offset_y."""
+    while not check_collision(board, shape, offset_x, offset_y + 1):
+        offset_y += 1
+    return offset_y
+
+
+def collides_masks(occupancy: Occupancy, masks: Tuple[int, ...], offset_x: int, offset_y: int) -> bool:
+    """check_collision on the occupancy view; the caller keeps offset_x in range."""
+    if offset_y < 0 or offset_y + len(masks) > len(occupancy):
+        return True
+    for y, m in enumerate(masks):
+        if occupancy[offset_y + y] & (m << offset_x):
+            return True
+    return False
+
+
+def place_piece(
+    board: Board,
+    shape: Shape,
+    offset_x: int,
+    offset_y: int,
+    value: int = 1,
+    occupancy: Optional[Occupancy] = None,
+):
+    for y, row in enumerate(shape):
+        board_row = board[offset_y + y]
+        for x, cell in enumerate(row):
+            if cell:
+                board_row[offset_x + x] = value
+    if occupancy is not None:
+        for y, m in enumerate(shape_masks(shape)):
+            occupancy[offset_y + y] |= m << offset_x
+
+
+def clear_lines(board: Board, occupancy: Optional[Occupancy] = None) -> int:
+    """
+    Remove full rows in place and shift everything above down.
+    With an occupancy view, full rows are found from it and it is updated too
+    (required for a NumPy board, which is shifted with one slice assignment).
+    Returns the number of rows cleared.
+    """
+    width = len(board[0])
+    if occupancy is None:
+        kept = [row for row in board if not all(row)]
+        cleared = len(board) - len(kept)
+        if cleared:
+            board[:] = [[0] * width for _ in range(cleared)] + kept
+        return cleared
+
+    full = (1 << width) - 1
+    full_rows = [y for y, m in enumerate(occupancy) if m == full]
+    cleared = len(full_rows)
+    if cleared:
+        if isinstance(board, list):
+            for y in reversed(full_rows):
+                del board[y]
+            board[0:0] = [[0] * width for _ in range(cleared)]
+        else:
+            full_set = set(full_rows)
+            kept = [y for y in range(len(board)) if y not in full_set]
+            # Fancy indexing copies the kept rows before they are overwritten
+            board[cleared:] = board[kept]
+            board[:cleared] = 0
+        for y in reversed(full_rows):
+            del occupancy[y]
+        occupancy[0:0] = [0] * cleared
+    return cleared
+
+
+def column_heights(occupancy: Occupancy, width: int) -> List[int]:
+    height = len(occupancy)
+    heights = [0] * width
+    seen = 0
+    for y, m in enumerate(occupancy):
+        new = m & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = height - y
+            new ^= low
+        seen |= m
+    return heights
+
+
+def count_holes(occupancy: Occupancy) -> int:
+    """Empty cells with a filled cell somewhere above them in the same column."""
+    holes = 0
+    seen = 0
+    for m in occupancy:
+        holes += (seen & ~m).bit_count()
+        seen |= m
+    return holes
+
+
+def bumpiness(heights: List[int]) -> int:
+    return sum(abs(heights[i] - heights[i + 1]) for i in range(len(heights) - 1))
+
+
+def line_score(lines_cleared: int) -> int:
+    return lines_cleared * 100
+
+
+def level_for_lines(lines_cleared_total: int) -> int:
+    # Every 10 lines increases the level by 1
+    return 1 + lines_cleared_total // 10
+
+
+def try_rotate(board: Board, shape: Shape, offset_x: int, offset_y: int) -> Tuple[Shape, bool]:
+    """Rotate clockwise unless the rotated piece would collide."""
+    rotated = rotate_shape(shape)
+    if check_collision(board, rotated, offset_x, offset_y):
+        return shape, False
+    return rotated, True
+
+
+def execute_move(
+    board: Board,
+    shape: Shape,
+    offset_x: int,
+    offset_y: int,
+    rotations: int,
+    target_x: int,
+) -> Tuple[Shape, int, int, int]:
+    """
+    Carry out an AI plan the way TetrisGame.ai_step does: rotate in place
+    (skipping blocked rotations), slide one column at a time toward target_x
+    (stopping if blocked), then hard-drop.
+    Returns (shape, x, y, rotations_applied).
+    """
+    applied = 0
+    for _ in range(rotations):
+        shape, ok = try_rotate(board, shape, offset_x, offset_y)
+        applied += ok
+    step = 1 if target_x > offset_x else -1
+    while offset_x != target_x and not check_collision(board, shape, offset_x + step, offset_y):
+        offset_x += step
+    return shape, offset_x, drop_y(board, shape, offset_x, offset_y), applied
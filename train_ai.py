@@ -7,145 +7,330 @@ Created on Sat Nov 22 18:00:52 2025
 """
 
 # train_ai.py
+import argparse
+import json
+import os
 import random
 import pickle
-from typing import List
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, Optional
 import numpy as np
 from sklearn.linear_model import LinearRegression
 
 from ai_agent import TetrisAI, WEIGHTS_FILE
+from episode_stats import PlacementRecorder, read_placements
+from replay import ReplayRecorder
+from telemetry import Telemetry
+import tetris_rules
+from tetris_rules import GRID_WIDTH, GRID_HEIGHT, SHAPES
 
-GRID_WIDTH = 12   # match tetris_game.py
-GRID_HEIGHT = 22
-
-
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1],
-     [1, 1]],        # O
-    [[0, 1, 0],
-     [1, 1, 1]],     # T
-    [[1, 0, 0],
-     [1, 1, 1]],     # J
-    [[0, 0, 1],
-     [1, 1, 1]],     # L
-    [[1, 1, 0],
-     [0, 1, 1]],     # S
-    [[0, 1, 1],
-     [1, 1, 0]],     # Z
-]
+TRIAL_LOG_FILE = "train_trials.jsonl"
+# Trial weights are drawn around TRIAL_BASE_WEIGHTS, +/- TRIAL_WEIGHT_SCALE
+TRIAL_BASE_WEIGHTS = (1.0, -0.5, -0.8, -0.3)
+TRIAL_WEIGHT_SCALE = 1.0
+TRIAL_MAX_STEPS = 400
 
 
 class HeadlessTetrisEnv:
     """
     Simple, non-graphical Tetris environment for training.
     Uses TetrisAI to decide moves given weights.
+
+    Optional cutoffs end an episode early and mark it as truncated:
+    - max_steps: piece budget (always on).
+    - max_stack_height / dominated_score: stop once the stack reaches
+      `max_stack_height` rows while the score is still <= `dominated_score`.
+    - time_budget: wall-clock seconds per episode.
+    - prune_below / rate_warmup_steps: after the warmup, stop when the
+      score rate extrapolated to `max_steps` falls below `prune_below`.
+
+    Board size is `width` x `height` (defaults from tetris_rules).
+
+    Pass an episode_stats.PlacementRecorder as `recorder` to log every
+    placement (piece, the rotation and x/y it locked at, lines, features,
+    decision time).
+    With `record_replay=True` each episode also keeps a replay.ReplayRecorder
+    in `self.replay`.
     """
 
-    def __init__(self, ai: TetrisAI, max_steps: int = 500):
+    def __init__(
+        self,
+        ai: TetrisAI,
+        max_steps: int = 500,
+        seed: Optional[int] = None,
+        max_stack_height: Optional[int] = None,
+        dominated_score: int = 0,
+        time_budget: Optional[float] = None,
+        prune_below: Optional[float] = None,
+        rate_warmup_steps: int = 50,
+        recorder=None,
+        record_replay: bool = False,
+        width: int = GRID_WIDTH,
+        height: int = GRID_HEIGHT,
+        telemetry=None,
+    ):
         self.ai = ai
+        self.width = width
+        self.height = height
         self.max_steps = max_steps
-        self.reset()
-
-    def reset(self):
-        self.board = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        self.max_stack_height = max_stack_height
+        self.dominated_score = dominated_score
+        self.time_budget = time_budget
+        self.prune_below = prune_below
+        self.rate_warmup_steps = rate_warmup_steps
+        # Optional episode_stats.PlacementRecorder; None keeps step() free of bookkeeping
+        self.recorder = recorder
+        self.record_replay = record_replay
+        # Optional telemetry.Telemetry; also handed to the AI for move-search timings
+        self.telemetry = telemetry
+        if telemetry is not None:
+            self.ai.telemetry = telemetry
+        self.rng = random.Random(seed)
+        self.reset(seed)
+
+    def reset(self, seed: Optional[int] = None):
+        if self.record_replay and seed is None:
+            # A replay needs a known seed
+            seed = random.getrandbits(63)
+        if seed is not None:
+            self.rng.seed(seed)
+        self.replay = ReplayRecorder(seed, self.width, self.height) if self.record_replay else None
+        self.board = tetris_rules.new_board(self.width, self.height)
+        self.occupancy = [0] * self.height
         self.score = 0
+        self.lines = 0
         self.game_over = False
+        self.truncated = False
+        self.truncation_reason = None
         self.steps = 0
+        if self.recorder is not None:
+            self.recorder.start_episode()
         self.spawn_new_piece()
 
     def spawn_new_piece(self):
-        idx = random.randint(0, len(SHAPES) - 1)
+        idx = self.rng.randint(0, len(SHAPES) - 1)
+        self.current_piece = idx
         self.current_shape = [row[:] for row in SHAPES[idx]]
-        self.shape_x = GRID_WIDTH // 2 - len(self.current_shape[0]) // 2
+        self.shape_x = tetris_rules.spawn_x(self.current_shape, self.width)
         self.shape_y = 0
         if self.check_collision(self.current_shape, self.shape_x, self.shape_y):
             self.game_over = True
 
     def check_collision(self, shape, offset_x, offset_y) -> bool:
-        for y, row in enumerate(shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    bx = offset_x + x
-                    by = offset_y + y
-                    if bx < 0 or bx >= GRID_WIDTH or by < 0 or by >= GRID_HEIGHT:
-                        return True
-                    if self.board[by][bx]:
-                        return True
-        return False
-
-    def lock_piece(self):
-        for y, row in enumerate(self.current_shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    self.board[self.shape_y + y][self.shape_x + x] = 1
-        self.clear_lines()
+        return tetris_rules.check_collision(self.board, shape, offset_x, offset_y)
+
+    def lock_piece(self, rotation: int = 0):
+        if self.replay is not None:
+            self.replay.record(self.shape_x, self.shape_y, rotation)
+        tetris_rules.place_piece(
+            self.board,
+            self.current_shape,
+            self.shape_x,
+            self.shape_y,
+            self.current_piece + 1,
+            occupancy=self.occupancy,
+        )
+        lines_cleared = self.clear_lines()
         self.spawn_new_piece()
+        return lines_cleared
 
     def clear_lines(self):
-        new_board = []
-        lines_cleared = 0
-        for row in self.board:
-            if all(row):
-                lines_cleared += 1
-            else:
-                new_board.append(row)
-        while len(new_board) < GRID_HEIGHT:
-            new_board.insert(0, [0 for _ in range(GRID_WIDTH)])
-        self.board = new_board
-        self.score += lines_cleared * 100
-
-    def _board_to_binary(self) -> List[List[int]]:
-        return [[1 if cell != 0 else 0 for cell in row] for row in self.board]
-
-    def _shape_to_binary(self, shape) -> List[List[int]]:
-        return [[1 if cell != 0 else 0 for cell in row] for row in shape]
+        lines_cleared = tetris_rules.clear_lines(self.board, self.occupancy)
+        self.score += tetris_rules.line_score(lines_cleared)
+        self.lines += lines_cleared
+        return lines_cleared
+
+    def stack_height(self) -> int:
+        for y, m in enumerate(self.occupancy):
+            if m:
+                return self.height - y
+        return 0
+
+    def projected_score(self) -> float:
+        """Final score extrapolated from the current score rate to max_steps."""
+        if self.steps == 0:
+            return float(self.score)
+        return self.score * max(self.max_steps, self.steps) / self.steps
+
+    def _truncate(self, reason: str):
+        self.truncated = True
+        self.truncation_reason = reason
+        self.game_over = True
+
+    def check_cutoffs(self, elapsed: float = 0.0) -> bool:
+        """Apply the configured cutoffs; returns True if the episode was truncated."""
+        if self.game_over:
+            return False
+        if self.steps >= self.max_steps:
+            self._truncate("max_steps")
+        elif (
+            self.max_stack_height is not None
+            and self.score <= self.dominated_score
+            and self.stack_height() >= self.max_stack_height
+        ):
+            self._truncate("dominated")
+        elif self.time_budget is not None and elapsed >= self.time_budget:
+            self._truncate("time_budget")
+        elif (
+            self.prune_below is not None
+            and self.steps >= self.rate_warmup_steps
+            and self.projected_score() < self.prune_below
+        ):
+            self._truncate("score_rate")
+        return self.truncated
 
     def step(self):
         """
         One AI decision + piece drop until lock.
         """
-        if self.game_over or self.steps > self.max_steps:
-            self.game_over = True
+        if self.game_over:
+            return
+        if self.steps >= self.max_steps:
+            self._truncate("max_steps")
             return
 
-        binary_board = self._board_to_binary()
-        binary_shape = self._shape_to_binary(self.current_shape)
-
-        rotation, target_x = self.ai.choose_best_move(
-            binary_board, SHAPES, binary_shape
-        )
+        recorder = self.recorder
+        if recorder is not None:
+            piece = self.current_piece
+            t0 = time.perf_counter()
 
-        # Apply rotation
-        for _ in range(rotation):
-            self.current_shape = self.ai.rotate_shape(self.current_shape)
+        rotation, target_x = self.ai.choose_move(self.occupancy, self.width, self.current_shape)
 
-        # Move horizontally
-        while self.shape_x < target_x and not self.check_collision(self.current_shape, self.shape_x + 1, self.shape_y):
-            self.shape_x += 1
-        while self.shape_x > target_x and not self.check_collision(self.current_shape, self.shape_x - 1, self.shape_y):
-            self.shape_x -= 1
+        if recorder is not None:
+            decision_us = (time.perf_counter() - t0) * 1e6
 
-        # Drop
-        while not self.check_collision(self.current_shape, self.shape_x, self.shape_y + 1):
-            self.shape_y += 1
-        self.lock_piece()
+        # Rotate, slide and hard-drop exactly as TetrisGame.ai_step would
+        self.current_shape, self.shape_x, self.shape_y, applied = tetris_rules.execute_move(
+            self.board, self.current_shape, self.shape_x, self.shape_y, rotation, target_x
+        )
+        placed_x, placed_y = self.shape_x, self.shape_y
+        lines_cleared = self.lock_piece(applied)
         self.steps += 1
 
-    def run_episode(self) -> int:
-        self.reset()
+        if recorder is not None:
+            heights = tetris_rules.column_heights(self.occupancy, self.width)
+            recorder.record(
+                self.steps - 1,
+                piece,
+                applied % 4,
+                placed_x,
+                placed_y,
+                lines_cleared,
+                sum(heights),
+                tetris_rules.count_holes(self.occupancy),
+                tetris_rules.bumpiness(heights),
+                decision_us,
+            )
+
+    def run_episode(self, seed: Optional[int] = None) -> int:
+        return self.run_episode_result(seed)["score"]
+
+    def run_episode_result(self, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Play one episode and return its outcome, including whether a cutoff
+        truncated it and the score extrapolated to max_steps.
+        """
+        self.reset(seed)
+        start = time.perf_counter()
         while not self.game_over:
             self.step()
-        return self.score
-
-
-def random_weights(base=(1.0, -0.5, -0.8, -0.3), scale=0.5):
+            self.check_cutoffs(time.perf_counter() - start)
+        if self.telemetry is not None:
+            self.telemetry.add_time("episode", time.perf_counter() - start)
+            self.telemetry.count("episodes")
+            self.telemetry.count("pieces", self.steps)
+            if self.truncated:
+                self.telemetry.count(f"truncated.{self.truncation_reason}")
+        return {
+            "score": self.score,
+            "steps": self.steps,
+            "lines": self.lines,
+            "truncated": self.truncated,
+            "reason": self.truncation_reason,
+            "projected_score": self.projected_score() if self.truncated else float(self.score),
+        }
+
+
+def random_weights(base=(1.0, -0.5, -0.8, -0.3), scale=0.5, rng=None):
+    rng = rng or random
     return tuple(
-        b + random.uniform(-scale, scale) for b in base
+        b + rng.uniform(-scale, scale) for b in base
     )
 
 
-def train(num_trials: int = 40, episodes_per_trial: int = 2):
+def load_trial_log(path: str = TRIAL_LOG_FILE) -> Dict[int, Dict[str, Any]]:
+    """
+    Read completed trials from an append-only JSON-lines log.
+    A torn last line (crash mid-write) is ignored.
+    """
+    trials = {}
+    if not os.path.exists(path):
+        return trials
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "trial" in record:
+                trials[record["trial"]] = record
+    return trials
+
+
+def load_sweep_header(path: str = TRIAL_LOG_FILE) -> Optional[Dict[str, Any]]:
+    """The sweep config from the log's first line, or None if it has none."""
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.loads(f.readline()).get("sweep")
+        except (json.JSONDecodeError, AttributeError):
+            return None
+
+
+def sweep_config(
+    num_trials: int,
+    episodes_per_trial: int,
+    seed: int,
+    cutoffs: Optional[Dict[str, Any]],
+    width: int,
+    height: int,
+) -> Dict[str, Any]:
+    """Everything that decides a trial's weights, seeds and score, as stored in the log header."""
+    config = {
+        "seed": seed,
+        "trials": num_trials,
+        "episodes": episodes_per_trial,
+        "weight_base": list(TRIAL_BASE_WEIGHTS),
+        "weight_scale": TRIAL_WEIGHT_SCALE,
+        "max_steps": TRIAL_MAX_STEPS,
+        "width": width,
+        "height": height,
+        "cutoffs": {k: v for k, v in (cutoffs or {}).items() if v is not None},
+    }
+    # Compare in the form it takes after a round trip through the log
+    return json.loads(json.dumps(config))
+
+
+def append_trial_log(f, record: Dict[str, Any]):
+    """Write one trial record and force it to disk before the next trial starts."""
+    f.write(json.dumps(record) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def train(
+    num_trials: int = 40,
+    episodes_per_trial: int = 2,
+    seed: int = 0,
+    log_path: str = TRIAL_LOG_FILE,
+    resume: bool = False,
+    force: bool = False,
+    cutoffs: Optional[Dict[str, Any]] = None,
+    width: int = GRID_WIDTH,
+    height: int = GRID_HEIGHT,
+    telemetry: Optional[Telemetry] = None,
+    placements_path: Optional[str] = None,
+):
     """
     Simple ML-style loop:
     - Try many random weight vectors.
@@ -153,47 +338,160 @@ def train(num_trials: int = 40, episodes_per_trial: int = 2):
     - Fit LinearRegression: weights -> expected score.
     - Use model to pick a promising candidate.
     - Save best weights to ai_weights.pkl.
+
+    Every trial is appended to `log_path` as soon as it finishes. Weights and
+    episode seeds are derived from `seed` and the trial index, so with
+    `resume=True` completed trials are reloaded from the log and the sweep
+    continues where it stopped. Without a time_budget cutoff the result is
+    the same as an uninterrupted run. With one, where an episode is cut off
+    depends on wall-clock time, so re-run trials may score differently (a
+    warning is printed). The log starts with a header holding the sweep config
+    (seed, trials, episodes, weight bounds, board size, cutoffs); resuming a
+    log whose header differs raises ValueError rather than mixing sweeps. An
+    existing log is only overwritten with `force=True` (FileExistsError
+    otherwise).
+
+    `cutoffs` is passed to HeadlessTetrisEnv (max_stack_height, time_budget,
+    prune_below, ...). Truncated episodes contribute their extrapolated score
+    to the regression target. `width`/`height` set the board size.
+
+    With `placements_path`, every placement of every trial episode is
+    appended there (episode_stats format) after each trial; it is checked
+    against `resume`/`force` like the log.
+
+    With a telemetry.Telemetry, episodes, move search, feature evaluation and
+    regression fitting are timed (and optionally profiled per trial), and a
+    summary is printed at the end.
     """
     print("[TRAIN] Starting training...")
 
+    def timed(name):
+        return telemetry.timer(name) if telemetry is not None else nullcontext()
+
+    def profiled(label):
+        return telemetry.profile(label) if telemetry is not None else nullcontext()
+
+    config = sweep_config(num_trials, episodes_per_trial, seed, cutoffs, width, height)
+    existing = os.path.exists(log_path) and os.path.getsize(log_path) > 0
+    completed = {}
+    if existing and resume:
+        header = load_sweep_header(log_path)
+        if header is None:
+            raise ValueError(f"{log_path} has no sweep header, so it cannot be checked for resuming")
+        changed = [f"{k}: log {header.get(k)!r}, now {v!r}" for k, v in config.items() if header.get(k) != v]
+        if changed:
+            raise ValueError(f"{log_path} is from a different sweep ({'; '.join(changed)})")
+        completed = load_trial_log(log_path)
+        print(f"[TRAIN] Resuming: {len(completed)} trial(s) loaded from {log_path}")
+        if config["cutoffs"].get("time_budget") is not None:
+            print("[TRAIN] Warning: time_budget cuts episodes off by wall-clock time, so the resumed "
+                  "trials may score differently than in an uninterrupted run")
+    elif existing and not force:
+        raise FileExistsError(f"{log_path} already has trials; resume it or force a new sweep")
+
+    recorder = None
+    if placements_path is not None:
+        first_episode = 0
+        if os.path.exists(placements_path) and os.path.getsize(placements_path) > 0:
+            if existing and resume:
+                # Continue the episode numbering of the interrupted run
+                episodes = read_placements(placements_path)["episode"]
+                first_episode = int(episodes.max()) + 1 if len(episodes) else 0
+            elif force:
+                os.remove(placements_path)
+            else:
+                raise FileExistsError(f"{placements_path} already has placements; resume or force a new sweep")
+        recorder = PlacementRecorder(first_episode=first_episode)
+
     X = []
     y = []
 
-    base = (1.0, -0.5, -0.8, -0.3)
-
-    for trial in range(num_trials):
-        w = random_weights(base, scale=1.0)
-        ai = TetrisAI(
-            w_lines=w[0],
-            w_height=w[1],
-            w_holes=w[2],
-            w_bumpiness=w[3],
-            load_from_file=False,
-        )
-        env = HeadlessTetrisEnv(ai, max_steps=400)
-
-        scores = []
-        for _ in range(episodes_per_trial):
-            score = env.run_episode()
-            scores.append(score)
-
-        avg_score = sum(scores) / len(scores)
-        X.append(list(w))
-        y.append(avg_score)
-        print(f"[TRIAL {trial+1}/{num_trials}] weights={w}, avg_score={avg_score}")
-
+    base = TRIAL_BASE_WEIGHTS
+
+    with open(log_path, "a" if existing and resume else "w", encoding="utf-8") as log_file:
+        if log_file.tell() == 0:
+            append_trial_log(log_file, {"sweep": config})
+        else:
+            # Terminate a torn record so the next append starts on its own line
+            with open(log_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    log_file.write("\n")
+        for trial in range(num_trials):
+            if trial in completed:
+                record = completed[trial]
+                X.append(list(record["weights"]))
+                y.append(record["avg_score"])
+                continue
+
+            trial_rng = random.Random(f"{seed}:{trial}")
+            w = random_weights(base, scale=TRIAL_WEIGHT_SCALE, rng=trial_rng)
+            episode_seeds = [trial_rng.getrandbits(32) for _ in range(episodes_per_trial)]
+            ai = TetrisAI(
+                w_lines=w[0],
+                w_height=w[1],
+                w_holes=w[2],
+                w_bumpiness=w[3],
+                load_from_file=False,
+            )
+            env = HeadlessTetrisEnv(
+                ai,
+                max_steps=TRIAL_MAX_STEPS,
+                width=width,
+                height=height,
+                telemetry=telemetry,
+                recorder=recorder,
+                **(cutoffs or {}),
+            )
+
+            start = time.perf_counter()
+            scores = []
+            projected = []
+            truncated = []
+            with timed("trial"), profiled(f"trial_{trial:04d}"):
+                for episode_seed in episode_seeds:
+                    result = env.run_episode_result(seed=episode_seed)
+                    scores.append(result["score"])
+                    projected.append(result["projected_score"])
+                    truncated.append(result["reason"] if result["truncated"] else None)
+            runtime = time.perf_counter() - start
+
+            avg_score = sum(projected) / len(projected)
+            X.append(list(w))
+            y.append(avg_score)
+            append_trial_log(
+                log_file,
+                {
+                    "trial": trial,
+                    "weights": list(w),
+                    "seeds": episode_seeds,
+                    "scores": scores,
+                    "truncated": truncated,
+                    "avg_score": avg_score,
+                    "runtime_s": round(runtime, 4),
+                },
+            )
+            if recorder is not None:
+                # After the log record, so a resumed trial never repeats its placements
+                recorder.flush_to(placements_path)
+            print(f"[TRIAL {trial+1}/{num_trials}] weights={w}, avg_score={avg_score}")
+            if telemetry is not None:
+                telemetry.export({"trial": trial, "runtime_s": round(runtime, 4), **telemetry.snapshot()})
     X = np.array(X)
     y = np.array(y)
 
     model = LinearRegression()
-    model.fit(X, y)
+    with timed("regression_fit"):
+        model.fit(X, y)
     print("[TRAIN] Regression coefficients:", model.coef_, "intercept:", model.intercept_)
 
+    candidate_rng = random.Random(f"{seed}:candidates")
     candidate_weights = []
     for _ in range(50):
-        candidate_weights.append(random_weights(base, scale=1.5))
+        candidate_weights.append(random_weights(base, scale=1.5, rng=candidate_rng))
     candidate_weights = np.array(candidate_weights)
-    preds = model.predict(candidate_weights)
+    with timed("regression_predict"):
+        preds = model.predict(candidate_weights)
     best_idx = int(np.argmax(preds))
     best_w = tuple(candidate_weights[best_idx])
     print("[TRAIN] Best predicted weights from model:", best_w, "predicted score:", preds[best_idx])
@@ -206,8 +504,9 @@ def train(num_trials: int = 40, episodes_per_trial: int = 2):
         w_bumpiness=best_w[3],
         load_from_file=False,
     )
-    env_best = HeadlessTetrisEnv(ai_best, max_steps=500)
-    verify_scores = [env_best.run_episode() for _ in range(3)]
+    env_best = HeadlessTetrisEnv(ai_best, max_steps=500, width=width, height=height)
+    with timed("verify"):
+        verify_scores = [env_best.run_episode() for _ in range(3)]
     verify_avg = sum(verify_scores) / len(verify_scores)
     print("[TRAIN] Verified avg score with best weights:", verify_avg)
 
@@ -215,6 +514,64 @@ def train(num_trials: int = 40, episodes_per_trial: int = 2):
         pickle.dump(best_w, f)
     print(f"[TRAIN] Saved best weights to {WEIGHTS_FILE}: {best_w}")
 
+    if telemetry is not None:
+        print(telemetry.summary())
+        telemetry.export({"summary": telemetry.snapshot()})
+
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train TetrisAI heuristic weights.")
+    parser.add_argument("--trials", type=int, default=40)
+    parser.add_argument("--episodes", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default=TRIAL_LOG_FILE, help="append-only trial log (JSON lines)")
+    parser.add_argument("--resume", action="store_true", help="skip trials already in the log and continue")
+    parser.add_argument("--force", action="store_true", help="overwrite an existing trial log")
+    parser.add_argument("--width", type=int, default=GRID_WIDTH, help="board columns")
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT, help="board rows")
+    parser.add_argument("--max-stack-height", type=int, default=None,
+                        help="stop an episode once the stack is this tall with no score")
+    parser.add_argument("--time-budget", type=float, default=None, help="seconds per episode")
+    parser.add_argument("--prune-below", type=float, default=None,
+                        help="stop when the extrapolated final score falls below this")
+    parser.add_argument("--record-placements", default=None, metavar="PATH",
+                        help="append every trial placement to this episode_stats file")
+    parser.add_argument("--telemetry", action="store_true", help="time the run and print a summary")
+    parser.add_argument("--telemetry-out", default=None, help="also export telemetry as JSON lines")
+    parser.add_argument("--profile-dir", default=None, help="save a profile of every trial here")
+    parser.add_argument("--profiler", choices=("cprofile", "pyinstrument"), default="cprofile")
+    args = parser.parse_args()
+
+    telemetry = None
+    if args.telemetry or args.telemetry_out or args.profile_dir:
+        # Kept like the trial log: added to on --resume, replaced only with --force
+        out = args.telemetry_out
+        if out and os.path.exists(out) and os.path.getsize(out) > 0 and not (args.resume or args.force):
+            raise SystemExit(f"[TRAIN] {out} already has telemetry; resume the sweep or force a new one "
+                             "(see --resume / --force)")
+        telemetry = Telemetry(
+            jsonl_path=out, profile_dir=args.profile_dir, profiler=args.profiler, append=args.resume
+        )
+
+    cutoffs = {
+        "max_stack_height": args.max_stack_height,
+        "time_budget": args.time_budget,
+        "prune_below": args.prune_below,
+    }
+
+    try:
+        train(
+            num_trials=args.trials,
+            episodes_per_trial=args.episodes,
+            seed=args.seed,
+            log_path=args.log,
+            resume=args.resume,
+            force=args.force,
+            cutoffs=cutoffs,
+            width=args.width,
+            height=args.height,
+            telemetry=telemetry,
+            placements_path=args.record_placements,
+        )
+    except (ValueError, FileExistsError) as e:
+        raise SystemExit(f"[TRAIN] {e} (see --resume / --force)")